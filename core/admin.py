@@ -9,6 +9,7 @@ from core.models import (
     Image,
     ProductImage,
     Catalog,
+    ImportJob,
 )
 
 
@@ -50,3 +51,8 @@ class ProductImageAdmin(admin.ModelAdmin):
 @admin.register(Catalog)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ("name",)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "created_on", "finished_on")
@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, m2m_changed
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from core.metrics import install_query_recorder
+        from core.serializers import compile_serializers
+        from core.versions import (
+            bump_sender_version,
+            bump_m2m_version,
+            is_tracked,
+        )
+
+        compile_serializers(self.get_models())
+
+        # Receivers are connected per model, so that bulk deletes of other
+        # models (e.g. through tables) aren't slowed down by the signals.
+        for model in self.get_models():
+            if is_tracked(model):
+                post_save.connect(bump_sender_version, sender=model)
+                post_delete.connect(bump_sender_version, sender=model)
+        m2m_changed.connect(bump_m2m_version)
+
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,84 @@
+"""
+ASGI handler sending streaming responses without blocking the event loop.
+
+Django 4.1 sends streaming responses by iterating them synchronously
+in the event loop, so a response reading rows from the database while
+it's being sent can't be served under ASGI, and a slow client would
+block the loop. Responses with ``is_async`` set (see
+core.streaming.AsyncStreamingHttpResponse) are sent from their async
+iterator instead, which is what Django does by itself since 4.2. Other
+streaming responses are iterated one part at a time in the thread
+of the synchronous view, which holds its database connection.
+"""
+from typing import AsyncIterator, Iterable
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+
+# Returned by next() when a synchronous iterator is exhausted
+_END = object()
+
+
+async def aiter_in_thread(parts: Iterable) -> AsyncIterator:
+    """
+    Iterate a synchronous iterable, taking every part in the thread
+    shared by the synchronous code of the request.
+
+    :param parts: Iterable, e.g. content of a streaming response
+    """
+    iterator = iter(parts)
+    get_next = sync_to_async(next, thread_sensitive=True)
+    while True:
+        part = await get_next(iterator, _END)
+        if part is _END:
+            return
+        yield part
+
+
+class ASGIHandler(BaseASGIHandler):
+    """
+    ASGI handler supporting async streaming responses.
+    """
+
+    async def send_response(self, response, send):
+        """
+        Send the response, taking the body of a streaming response
+        from its async iterator or from a thread.
+        """
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        if getattr(response, "is_async", False):
+            parts = response.__aiter__()
+        else:
+            parts = aiter_in_thread(iter(response))
+
+        async def send_body(message):
+            # The base class sends the headers, the synchronous content,
+            # which is emptied below, and a final message closing the body.
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body"
+            ):
+                async for part in parts:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": chunk,
+                                "more_body": True,
+                            }
+                        )
+            await send(message)
+
+        response.streaming_content = ()
+        await super().send_response(response, send_body)
+
+
+def get_asgi_application() -> ASGIHandler:
+    """
+    Return the ASGI application, same as
+    django.core.asgi.get_asgi_application.
+    """
+    django.setup(set_prefix=False)
+    return ASGIHandler()
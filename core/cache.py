@@ -0,0 +1,234 @@
+"""
+Conditional GETs and read-through cache of list and detail responses.
+
+ETags are derived from versions of all models a response depends on
+(see core.versions), and of the object's ``updated_on`` on the detail
+endpoint. They are known before any data is loaded, so unchanged
+responses are answered with 304 Not Modified or served from the cache
+without running the main query. An import changing any of the models
+changes the ETag, which makes the cached responses unreachable, and they
+are evicted by the LRU cache backend.
+"""
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from core.versions import aget_versions, get_versions
+
+
+def get_dependencies(model, fields: Iterable[str], tree: dict) -> set:
+    """
+    Return models whose data is contained in a response: the model,
+    through models of its many-to-many fields and expanded models.
+
+    :param model: Model class
+    :param fields: Names of the returned fields
+    :param tree: Tree of expanded relations, see core.expand
+    """
+    models = {model}
+    for name in [*fields, *tree]:
+        field = model._meta.get_field(name)
+        if field.many_to_many:
+            models.add(field.remote_field.through)
+    for name, subtree in tree.items():
+        models |= get_dependencies(
+            model._meta.get_field(name).related_model, [], subtree
+        )
+    return models
+
+
+def get_validators(
+    request, models: Iterable, updated_on: Optional[datetime] = None
+) -> tuple[str, Optional[datetime]]:
+    """
+    Return 2-tuple of (ETag, last modification time) of a response
+    to the request, changing whenever data of any of the models changes.
+
+    :param request: HttpRequest
+    :param models: Models the response depends on
+    :param updated_on: Time of the last change of the returned object
+    """
+    return make_validators(request, get_versions(models), updated_on)
+
+
+async def aget_validators(
+    request, models: Iterable, updated_on: Optional[datetime] = None
+) -> tuple[str, Optional[datetime]]:
+    """
+    Async version of get_validators.
+    """
+    return make_validators(request, await aget_versions(models), updated_on)
+
+
+def make_validators(
+    request, versions: dict, updated_on: Optional[datetime] = None
+) -> tuple[str, Optional[datetime]]:
+    """
+    Return 2-tuple of (ETag, last modification time) of a response
+    to the request from versions of the models it depends on.
+
+    :param request: HttpRequest
+    :param versions: Versions returned by get_versions
+    :param updated_on: Time of the last change of the returned object
+    """
+    # The time of the change is included too, so that the ETag doesn't
+    # repeat if versions start over, e.g. after the database is recreated.
+    parts = [
+        request.path,
+        "&".join(sorted(request.GET.urlencode().split("&"))),
+    ]
+    changes = []
+    for name in sorted(versions):
+        version, changed_on = versions[name]
+        parts.append(f"{name}:{version}:{changed_on.timestamp()}")
+        changes.append(changed_on)
+    if updated_on:
+        parts.append(f"object:{updated_on.timestamp()}")
+        changes.append(updated_on)
+
+    etag = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f'"{etag}"', max(changes, default=None)
+
+
+def get_not_modified(
+    request, etag: str, last_modified: Optional[datetime]
+) -> Optional[HttpResponse]:
+    """
+    Return 304 Not Modified if the client has the current version
+    of the response, else None.
+
+    :param request: HttpRequest
+    :param etag: ETag of the response
+    :param last_modified: Time of the last change of the response
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp())
+        if last_modified
+        else None,
+    )
+
+
+def get_cache_key(etag: str) -> str:
+    """
+    Return cache key of a response with the ETag.
+
+    :param etag: ETag of the response
+    """
+    return "response:" + etag.strip('"')
+
+
+def is_cacheable(response: HttpResponse) -> bool:
+    """
+    Whether the response is successful and small enough to be cached.
+
+    :param response: Response to cache
+    """
+    return (
+        response.status_code == 200
+        and len(response.content) <= settings.RESPONSE_CACHE_MAX_SIZE
+    )
+
+
+def get_cached_response(key: str) -> Optional[HttpResponse]:
+    """
+    Return cached response, or None if it is not cached.
+
+    :param key: Cache key
+    """
+    content = caches[settings.RESPONSE_CACHE].get(key)
+    if content is None:
+        return None
+    return HttpResponse(content, content_type="application/json")
+
+
+def cache_response(key: str, response: HttpResponse) -> None:
+    """
+    Cache content of a successful response, unless it is too large.
+
+    :param key: Cache key
+    :param response: Response to cache
+    """
+    if is_cacheable(response):
+        caches[settings.RESPONSE_CACHE].set(key, response.content)
+
+
+def set_validators(
+    response: HttpResponse, etag: str, last_modified: Optional[datetime]
+) -> HttpResponse:
+    """
+    Add ETag and Last-Modified headers to a successful response.
+
+    :param response: Response
+    :param etag: ETag of the response
+    :param last_modified: Time of the last change of the response
+    """
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def cached_response(
+    request,
+    models: Iterable,
+    build: Callable[[], HttpResponse],
+    updated_on: Optional[datetime] = None,
+) -> HttpResponse:
+    """
+    Return 304 Not Modified if the client has the current version
+    of the response, else the cached response, else the response
+    returned by build, which is cached. Successful responses get
+    ETag and Last-Modified headers.
+
+    :param request: HttpRequest
+    :param models: Models the response depends on
+    :param build: Function returning the response
+    :param updated_on: Time of the last change of the returned object
+    """
+    etag, last_modified = get_validators(request, models, updated_on)
+    response = get_not_modified(request, etag, last_modified)
+    if response is None:
+        key = get_cache_key(etag)
+        response = get_cached_response(key)
+        if response is None:
+            response = build()
+            cache_response(key, response)
+    return set_validators(response, etag, last_modified)
+
+
+async def acached_response(
+    request,
+    models: Iterable,
+    build: Callable[[], Awaitable[HttpResponse]],
+    updated_on: Optional[datetime] = None,
+) -> HttpResponse:
+    """
+    Async version of cached_response.
+
+    :param request: HttpRequest
+    :param models: Models the response depends on
+    :param build: Async function returning the response
+    :param updated_on: Time of the last change of the returned object
+    """
+    etag, last_modified = await aget_validators(request, models, updated_on)
+    response = get_not_modified(request, etag, last_modified)
+    if response is None:
+        key = get_cache_key(etag)
+        cache = caches[settings.RESPONSE_CACHE]
+        content = await cache.aget(key)
+        if content is not None:
+            response = HttpResponse(content, content_type="application/json")
+        else:
+            response = await build()
+            if is_cacheable(response):
+                await cache.aset(key, response.content)
+    return set_validators(response, etag, last_modified)
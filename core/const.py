@@ -14,5 +14,5 @@ IMPORT_MAPPING = {
     "attribute": "attribute_id",
 }
 
-
-
+# Internal models which are not available through the import or detail API
+PRIVATE_MODELS = {"importjob", "modelversion", "catalogdocument"}
@@ -0,0 +1,206 @@
+"""
+Materialized catalog documents.
+
+Every catalog has a precomputed JSON document with its image, attributes
+and products, each product with its attributes and images, so that
+a catalog is read with one primary key lookup. Documents are rebuilt
+by the importer for the catalogs affected by the written rows, and built
+on the first read if missing.
+"""
+import json
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.utils import timezone
+
+from core.expand import serialize_related, with_related
+from core.models import (
+    Attribute,
+    AttributeName,
+    AttributeValue,
+    Catalog,
+    CatalogDocument,
+    Image,
+    Product,
+    ProductAttribute,
+    ProductImage,
+)
+from core.utils import iter_chunks
+
+# Relations included in a document, see core.expand
+DOCUMENT_TREE = {
+    "image": {},
+    "attributes": {"name": {}, "value": {}},
+    "products": {
+        "attributes": {"name": {}, "value": {}},
+        "images": {},
+    },
+}
+
+# Models linking objects to a product, which may be moved to another one
+LINK_MODELS = (ProductAttribute, ProductImage)
+
+# Number of documents built at once
+BUILD_CHUNK_SIZE = 100
+
+
+def get_related_ids(queryset, lookup: str, ids: set, field: str) -> set:
+    """
+    Return values of a field of objects matching any of the IDs,
+    querying at most IMPORT_BATCH_SIZE IDs at once.
+
+    :param queryset: Queryset to filter
+    :param lookup: Field lookup compared with the IDs
+    :param ids: IDs to look up
+    :param field: Name of the returned field
+    """
+    result = set()
+    for chunk in iter_chunks(sorted(ids), settings.IMPORT_BATCH_SIZE):
+        result.update(
+            queryset.filter(**{lookup: chunk}).values_list(field, flat=True)
+        )
+    return result
+
+
+def get_linked_products(model, rows: list[dict]) -> dict:
+    """
+    Return IDs of products currently linked by the rows of a link model
+    by row ID, whose documents change if the rows move the links
+    elsewhere.
+
+    :param model: Model class of the rows
+    :param rows: Translated rows about to be written
+    """
+    if model not in LINK_MODELS or not any(
+        "product_id" in row for row in rows
+    ):
+        return {}
+    linked = {}
+    for chunk in iter_chunks(
+        sorted(row["id"] for row in rows), settings.IMPORT_BATCH_SIZE
+    ):
+        linked.update(
+            model.objects.filter(pk__in=chunk).values_list("pk", "product_id")
+        )
+    return linked
+
+
+def get_affected_catalogs(written: dict) -> set:
+    """
+    Return IDs of catalogs whose documents contain any of the objects.
+
+    :param written: Sets of IDs of written objects by model class
+    """
+    catalogs = set(written.get(Catalog, ()))
+    products = set(written.get(Product, ()))
+    attributes = set(written.get(Attribute, ()))
+    images = set(written.get(Image, ()))
+
+    names = written.get(AttributeName, set())
+    values = written.get(AttributeValue, set())
+    if names:
+        attributes |= get_related_ids(
+            Attribute.objects, "name_id__in", names, "pk"
+        )
+    if values:
+        attributes |= get_related_ids(
+            Attribute.objects, "value_id__in", values, "pk"
+        )
+    for model in LINK_MODELS:
+        if written.get(model):
+            products |= get_related_ids(
+                model.objects, "pk__in", written[model], "product_id"
+            )
+
+    if attributes:
+        products |= get_related_ids(
+            ProductAttribute.objects,
+            "attribute_id__in",
+            attributes,
+            "product_id",
+        )
+        catalogs |= get_related_ids(
+            Catalog.attributes.through.objects,
+            "attribute_id__in",
+            attributes,
+            "catalog_id",
+        )
+    if images:
+        products |= get_related_ids(
+            ProductImage.objects, "image_id__in", images, "product_id"
+        )
+        catalogs |= get_related_ids(
+            Catalog.objects, "image_id__in", images, "pk"
+        )
+    if products:
+        catalogs |= get_related_ids(
+            Catalog.products.through.objects,
+            "product_id__in",
+            products,
+            "catalog_id",
+        )
+    return catalogs
+
+
+def build_documents(catalog_ids: Iterable[int]) -> list[CatalogDocument]:
+    """
+    Build documents of existing catalogs with the given IDs,
+    using a fixed number of queries.
+
+    :param catalog_ids: IDs of the catalogs
+    """
+    catalogs = with_related(Catalog.objects.all(), DOCUMENT_TREE).filter(
+        pk__in=list(catalog_ids)
+    )
+    now = timezone.now()
+    return [
+        CatalogDocument(
+            catalog_id=catalog.pk,
+            content=json.dumps(
+                serialize_related(catalog, DOCUMENT_TREE),
+                cls=DjangoJSONEncoder,
+            ),
+            built_on=now,
+        )
+        for catalog in catalogs
+    ]
+
+
+def rebuild_documents(catalog_ids: Iterable[int]) -> int:
+    """
+    Rebuild and store documents of the catalogs, a chunk at a time.
+    Returns the number of rebuilt documents.
+
+    :param catalog_ids: IDs of the catalogs
+    """
+    count = 0
+    for chunk in iter_chunks(sorted(catalog_ids), BUILD_CHUNK_SIZE):
+        documents = build_documents(chunk)
+        with transaction.atomic(using=router.db_for_write(CatalogDocument)):
+            CatalogDocument.objects.filter(catalog_id__in=chunk).delete()
+            CatalogDocument.objects.bulk_create(documents)
+        count += len(documents)
+    return count
+
+
+def get_document(catalog_id: int) -> Optional[str]:
+    """
+    Return JSON document of a catalog, building it if it's missing,
+    or None if the catalog doesn't exist.
+
+    :param catalog_id: ID of the catalog
+    """
+    content = (
+        CatalogDocument.objects.filter(catalog_id=catalog_id)
+        .values_list("content", flat=True)
+        .first()
+    )
+    if content is None:
+        documents = build_documents([catalog_id])
+        if not documents:
+            return None
+        CatalogDocument.objects.bulk_create(documents, ignore_conflicts=True)
+        content = documents[0].content
+    return content
@@ -0,0 +1,190 @@
+"""
+Expansion of related objects (``?expand=``) on list and detail endpoints.
+
+Related objects are loaded with select_related for foreign keys and with
+one prefetch query per many-to-many relation, so the number of queries
+depends on the requested expansions, not on the number of objects.
+"""
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+
+from core.serializers import get_serializer
+from core.utils import InvalidQueryError, aiter_chunks, iter_chunks
+
+
+def parse_expand(model, params) -> dict:
+    """
+    Return tree of relations requested by ``?expand=``, e.g.
+    ``{"attributes": {"name": {}, "value": {}}, "images": {}}``
+    for ``?expand=attributes.name,attributes.value,images``.
+
+    :param model: Model class
+    :param params: Query string parameters
+    :raises InvalidQueryError: If a path doesn't consist of forward
+        foreign key or many-to-many fields
+    """
+    tree = {}
+    value = params.get("expand")
+    if not value:
+        return tree
+
+    for path in value.split(","):
+        node, current = tree, model
+        for name in path.strip().split("."):
+            try:
+                field = current._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise InvalidQueryError(f"Invalid expand: {path}")
+            # Reverse relations are auto created
+            if field.auto_created or not (
+                field.many_to_one or field.many_to_many
+            ):
+                raise InvalidQueryError(f"Invalid expand: {path}")
+            node = node.setdefault(name, {})
+            current = field.related_model
+    return tree
+
+
+def collect_related(
+    model, tree: dict, prefix: str = ""
+) -> tuple[list[str], list[Prefetch]]:
+    """
+    Return 2-tuple of (select_related lookups, Prefetch objects)
+    loading the relations of the tree.
+
+    :param model: Model class the tree starts from
+    :param tree: Tree returned by parse_expand
+    :param prefix: Lookup prefix, used when following foreign keys
+    """
+    select, prefetch = [], []
+    for name, subtree in tree.items():
+        field = model._meta.get_field(name)
+        if field.many_to_many:
+            prefetch.append(
+                Prefetch(
+                    prefix + name,
+                    queryset=with_related(
+                        field.related_model._default_manager.all(), subtree
+                    ),
+                )
+            )
+        else:
+            select.append(prefix + name)
+            related_select, related_prefetch = collect_related(
+                field.related_model, subtree, prefix + name + "__"
+            )
+            select += related_select
+            prefetch += related_prefetch
+    return select, prefetch
+
+
+def with_related(queryset: QuerySet, tree: dict) -> QuerySet:
+    """
+    Add select_related and prefetch_related calls loading the relations
+    of the tree to the queryset.
+
+    :param queryset: Queryset of objects to expand
+    :param tree: Tree returned by parse_expand
+    """
+    select, prefetch = collect_related(queryset.model, tree)
+    if select:
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch)
+
+
+def serialize_related(obj, tree: dict) -> dict:
+    """
+    Serialize a related object with its concrete fields
+    and expanded relations.
+
+    :param obj: Model instance
+    :param tree: Subtree of relations to expand
+    """
+    serializer = get_serializer(type(obj))
+    data = serializer.get_plan(tuple(serializer.concrete))(obj)
+    data.update(expand_object(obj, tree))
+    return data
+
+
+def expand_object(obj, tree: dict) -> dict:
+    """
+    Return expanded relations of an object loaded by a queryset
+    prepared with with_related.
+
+    :param obj: Model instance
+    :param tree: Tree returned by parse_expand
+    """
+    data = {}
+    for name, subtree in tree.items():
+        related = getattr(obj, name)
+        if obj._meta.get_field(name).many_to_many:
+            data[name] = [
+                serialize_related(item, subtree) for item in related.all()
+            ]
+        else:
+            data[name] = (
+                serialize_related(related, subtree)
+                if related is not None
+                else None
+            )
+    return data
+
+
+def expand_rows(model, rows: Iterable[dict], tree: dict) -> list[dict]:
+    """
+    Add expanded relations to rows returned by values(),
+    loading them for all rows at once.
+
+    :param model: Model class
+    :param rows: Rows containing the primary key
+    :param tree: Tree returned by parse_expand
+    """
+    rows = list(rows)
+    pk_name = model._meta.pk.attname
+    # Foreign keys followed by select_related can't be deferred
+    foreign_keys = [
+        name for name in tree if not model._meta.get_field(name).many_to_many
+    ]
+    queryset = model._default_manager.only("pk", *foreign_keys)
+    objs = with_related(queryset, tree).in_bulk(
+        [row[pk_name] for row in rows]
+    )
+    for row in rows:
+        row.update(expand_object(objs[row[pk_name]], tree))
+    return rows
+
+
+def iter_expanded_rows(
+    model, rows: Iterable[dict], tree: dict, chunk_size: int
+) -> Iterator[dict]:
+    """
+    Lazily add expanded relations to rows, loading them
+    for one chunk of rows at a time.
+
+    :param model: Model class
+    :param rows: Rows containing the primary key
+    :param tree: Tree returned by parse_expand
+    :param chunk_size: Number of rows expanded at once
+    """
+    for chunk in iter_chunks(rows, chunk_size):
+        yield from expand_rows(model, chunk, tree)
+
+
+async def aiter_expanded_rows(
+    model, rows: AsyncIterable[dict], tree: dict, chunk_size: int
+) -> AsyncIterator[dict]:
+    """
+    Async version of iter_expanded_rows. Prefetching isn't supported
+    by the async ORM, so every chunk is expanded in a worker thread.
+
+    :param model: Model class
+    :param rows: Rows containing the primary key
+    :param tree: Tree returned by parse_expand
+    :param chunk_size: Number of rows expanded at once
+    """
+    async for chunk in aiter_chunks(rows, chunk_size):
+        for row in await sync_to_async(expand_rows)(model, chunk, tree):
+            yield row
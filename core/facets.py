@@ -0,0 +1,208 @@
+"""
+Attribute facets of catalogs backed by in-memory bitmap indexes.
+
+The index of a catalog maps every (attribute name, value) pair to a bitmap
+of the catalog's products having it, stored as a Python int with one bit
+per product. Facet counts are then computed with a few AND/OR operations
+and bit counts instead of joins. Indexes are built on the first request
+and rebuilt when versions of the models they are built from change
+(see core.versions), e.g. after an import of ProductAttribute rows.
+Every web process keeps its own indexes of the most recently used
+catalogs, at most FACET_INDEX_MAX_CATALOGS of them.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+from core.models import (
+    Attribute,
+    AttributeName,
+    AttributeValue,
+    Catalog,
+    ProductAttribute,
+)
+from core.utils import InvalidQueryError
+from core.versions import get_versions
+
+# Models whose changes invalidate the indexes
+DEPENDENCIES = (
+    Catalog,
+    Catalog.products.through,
+    ProductAttribute,
+    Attribute,
+    AttributeName,
+    AttributeValue,
+)
+
+_indexes: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def parse_selected(params) -> dict[int, set[int]]:
+    """
+    Return selected value IDs by attribute name ID, parsed from
+    ``?selected=name_id:value_id,...``.
+
+    :param params: Query string parameters
+    :raises InvalidQueryError: If the parameter is not valid
+    """
+    selected: dict[int, set[int]] = {}
+    value = params.get("selected")
+    if not value:
+        return selected
+    for item in value.split(","):
+        try:
+            name_id, value_id = (int(part) for part in item.split(":"))
+        except ValueError:
+            raise InvalidQueryError(f"Invalid selected value: {item}")
+        selected.setdefault(name_id, set()).add(value_id)
+    return selected
+
+
+class FacetIndex:
+    """
+    Bitmap index of attributes of one catalog's products.
+
+    :param catalog_id: ID of the catalog
+    :param versions: Versions of DEPENDENCIES the index is built from
+    """
+
+    def __init__(self, catalog_id: int, versions: dict):
+        self.catalog_id = catalog_id
+        self.versions = versions
+        self.products = 0
+        self.bitmaps: dict[int, dict[int, int]] = {}
+        self.names: dict[int, dict] = {}
+        self.values: dict[int, str] = {}
+
+    def build(self) -> None:
+        """
+        Load the catalog's products and their attributes.
+        """
+        through = Catalog.products.through
+        product_ids = through.objects.filter(
+            catalog_id=self.catalog_id
+        ).values_list("product_id", flat=True)
+        bits: dict[int, int] = {}
+        for product_id in product_ids:
+            bits.setdefault(product_id, 1 << len(bits))
+        self.products = sum(bits.values())
+
+        rows = (
+            ProductAttribute.objects.filter(product_id__in=list(bits))
+            .exclude(attribute__value=None)
+            .values_list(
+                "product_id", "attribute__name_id", "attribute__value_id"
+            )
+        )
+        for product_id, name_id, value_id in rows:
+            values = self.bitmaps.setdefault(name_id, {})
+            values[value_id] = values.get(value_id, 0) | bits[product_id]
+
+        self.names = {
+            row["id"]: row
+            for row in AttributeName.objects.filter(
+                pk__in=list(self.bitmaps)
+            ).values("id", "name", "code")
+        }
+        self.values = dict(
+            AttributeValue.objects.filter(
+                pk__in={
+                    value_id
+                    for values in self.bitmaps.values()
+                    for value_id in values
+                }
+            ).values_list("id", "value")
+        )
+
+    def get_mask(
+        self, selected: dict[int, set[int]], exclude: Optional[int] = None
+    ) -> int:
+        """
+        Return bitmap of products having at least one of the selected
+        values of every attribute name.
+
+        :param selected: Selected value IDs by attribute name ID
+        :param exclude: Attribute name ID whose selection is ignored
+        """
+        mask = self.products
+        for name_id, value_ids in selected.items():
+            if name_id == exclude:
+                continue
+            values = self.bitmaps.get(name_id, {})
+            union = 0
+            for value_id in value_ids:
+                union |= values.get(value_id, 0)
+            mask &= union
+        return mask
+
+    def get_facets(self, selected: dict[int, set[int]]) -> dict:
+        """
+        Return the number of matching products and, for every attribute
+        name, its values with the number of products that would match
+        if the value were selected too.
+
+        :param selected: Selected value IDs by attribute name ID
+        """
+        matching = self.get_mask(selected)
+        facets = []
+        for name_id, values in self.bitmaps.items():
+            # Values of one name are alternatives, so the name's own
+            # selection doesn't restrict its counts.
+            mask = (
+                self.get_mask(selected, exclude=name_id)
+                if name_id in selected
+                else matching
+            )
+            selected_values = selected.get(name_id, set())
+            items = []
+            for value_id, bitmap in values.items():
+                count = (bitmap & mask).bit_count()
+                if count or value_id in selected_values:
+                    items.append(
+                        {
+                            "id": value_id,
+                            "value": self.values.get(value_id),
+                            "count": count,
+                            "selected": value_id in selected_values,
+                        }
+                    )
+            if items:
+                items.sort(key=lambda item: (-item["count"], item["value"]))
+                facets.append({**self.names[name_id], "values": items})
+
+        facets.sort(key=lambda facet: facet["name"])
+        return {
+            "catalog": self.catalog_id,
+            "count": matching.bit_count(),
+            "facets": facets,
+        }
+
+
+def get_facet_index(catalog_id: int) -> Optional[FacetIndex]:
+    """
+    Return up-to-date index of a catalog, building it if needed,
+    or None if the catalog doesn't exist.
+
+    :param catalog_id: ID of the catalog
+    """
+    versions = get_versions(DEPENDENCIES)
+    with _lock:
+        index = _indexes.get(catalog_id)
+        if index is not None and index.versions == versions:
+            _indexes.move_to_end(catalog_id)
+            return index
+
+    if not Catalog.objects.filter(pk=catalog_id).exists():
+        return None
+    index = FacetIndex(catalog_id, versions)
+    index.build()
+
+    with _lock:
+        _indexes[catalog_id] = index
+        _indexes.move_to_end(catalog_id)
+        while len(_indexes) > settings.FACET_INDEX_MAX_CATALOGS:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,107 @@
+"""
+Whitelisted query string filters and ordering of list endpoints.
+
+Only filters and orderings listed here are allowed, each of them
+is backed by a database index (see core.models).
+"""
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, DateTimeField, QuerySet
+from django.utils import timezone
+
+from core.utils import InvalidQueryError
+
+# Query string parameter -> field lookup, per model name
+FILTERS = {
+    "attributename": {
+        "code": "code",
+    },
+    "attribute": {
+        "name": "name_id",
+        "value": "value_id",
+    },
+    "product": {
+        "is_published": "is_published",
+        "currency": "currency",
+        "price_min": "price__gte",
+        "price_max": "price__lte",
+        "published_after": "published_on__gte",
+        "published_before": "published_on__lt",
+    },
+    "productattribute": {
+        "product": "product_id",
+        "attribute": "attribute_id",
+    },
+    "productimage": {
+        "product": "product_id",
+        "image": "image_id",
+    },
+    "catalog": {
+        "image": "image_id",
+    },
+}
+
+# Fields which can be passed to ?ordering=, per model name
+ORDERING = {
+    "product": ["price", "published_on"],
+}
+
+
+def to_python(field, value: str):
+    """
+    Convert a query string value to a Python value of the field.
+
+    :param field: Model field
+    :param value: Value from the query string
+    :raises ValidationError: If the value is not valid
+    """
+    if isinstance(field, BooleanField):
+        value = {"true": "1", "false": "0"}.get(value.lower(), value)
+    value = field.to_python(value)
+    if value is None:
+        raise ValidationError("Empty value")
+    if isinstance(field, DateTimeField) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def filter_queryset(queryset: QuerySet, params) -> QuerySet:
+    """
+    Apply filters listed in FILTERS for the queryset's model.
+    Other query string parameters are ignored.
+
+    :param queryset: Queryset to filter
+    :param params: Query string parameters
+    :raises InvalidQueryError: If a filter value is not valid
+    """
+    opts = queryset.model._meta
+    lookups = {}
+    for param, lookup in FILTERS.get(opts.model_name, {}).items():
+        if param not in params:
+            continue
+        field = opts.get_field(lookup.split("__")[0])
+        try:
+            lookups[lookup] = to_python(field, params[param])
+        except ValidationError:
+            raise InvalidQueryError(
+                f"Invalid value of {param}: {params[param]}"
+            )
+    return queryset.filter(**lookups)
+
+
+def get_ordering(model, params) -> Optional[str]:
+    """
+    Return field name requested by ``?ordering=``, prefixed with "-"
+    for descending order, or None if no ordering was requested.
+
+    :param model: Model class
+    :param params: Query string parameters
+    :raises InvalidQueryError: If the field is not listed in ORDERING
+    """
+    ordering = params.get("ordering")
+    if ordering is None:
+        return None
+    if ordering.lstrip("-") not in ORDERING.get(model._meta.model_name, []):
+        raise InvalidQueryError(f"Invalid ordering: {ordering}")
+    return ordering
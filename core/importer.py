@@ -0,0 +1,879 @@
+"""
+Bulk import engine used by the /import/ endpoint.
+
+Rows are buffered per model and written in batches using one SELECT
+of existing IDs, one bulk UPDATE and one INSERT ... ON CONFLICT (id)
+DO UPDATE query per batch, instead of one update_or_create call
+(SELECT + INSERT/UPDATE) per row.
+"""
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+from graphlib import TopologicalSorter
+from typing import Callable, Iterable, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    FieldError,
+    ValidationError,
+)
+from django.db import (
+    connections,
+    router,
+    transaction,
+    DataError,
+    IntegrityError,
+)
+from django.db.models import Model
+from django.utils import timezone
+
+from core.documents import (
+    get_affected_catalogs,
+    get_linked_products,
+    rebuild_documents,
+)
+from core.metrics import metrics
+from core.models import Product, TrackedModel
+from core.translation import M2M_KEYS, get_translation_plan
+from core.utils import iter_chunks, swap_string
+from core.versions import bump_versions
+
+# Whole payload is imported in one transaction
+ATOMIC_PAYLOAD = "payload"
+# Every flushed chunk of rows is imported in its own transaction
+ATOMIC_CHUNK = "chunk"
+ATOMIC_MODES = (ATOMIC_PAYLOAD, ATOMIC_CHUNK)
+
+# Errors caused by invalid data rather than by a bug in the import
+DATA_ERRORS = (
+    AttributeError,
+    TypeError,
+    ValueError,
+    DataError,
+    IntegrityError,
+    ValidationError,
+    FieldError,
+)
+
+
+class ImportDataError(Exception):
+    """
+    Raised when imported data is not valid and can't be written.
+    """
+
+
+@lru_cache(maxsize=None)
+def get_references(model) -> dict[str, type[Model]]:
+    """
+    Return mapping of row keys referencing other objects to the referenced
+    models, e.g. ``{"name_id": AttributeName, "value_id": AttributeValue}``
+    for Attribute or ``{"products_ids": Product, ...}`` for Catalog.
+
+    :param model: Model class
+    """
+    references = {
+        field.attname: field.related_model
+        for field in model._meta.concrete_fields
+        if field.many_to_one and field.related_model is not model
+    }
+    for key, field_name in M2M_KEYS.items():
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_many:
+            references[key] = field.related_model
+    return references
+
+
+@lru_cache(maxsize=None)
+def get_required_fields(model) -> frozenset[str]:
+    """
+    Return attnames of fields which a row creating a new object must
+    contain, because they are NOT NULL and have no default. String fields
+    default to an empty string.
+
+    :param model: Model class
+    """
+    return frozenset(
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.editable
+        and not field.primary_key
+        and not field.null
+        and not field.has_default()
+        and not field.empty_strings_allowed
+    )
+
+
+@lru_cache(maxsize=None)
+def get_import_order() -> tuple[type[Model], ...]:
+    """
+    Return models of the core app sorted topologically,
+    so that every model comes after the models it references.
+    """
+    graph = TopologicalSorter()
+    for model in apps.get_app_config("core").get_models():
+        graph.add(model, *get_references(model).values())
+    return tuple(graph.static_order())
+
+
+def get_update_fields(model, keys: Iterable[str]) -> list[str]:
+    """
+    Translate row keys (field names or attnames such as ``name_id``)
+    to names of concrete fields that should be updated on conflict.
+
+    :param model: Model class
+    :param keys: Keys of the imported row
+    :raises FieldError: If a key doesn't match a concrete field
+    """
+    update_fields = []
+    for key in keys:
+        try:
+            field = model._meta.get_field(key)
+        except FieldDoesNotExist:
+            raise FieldError(f"Invalid field name: {key}")
+        if not field.concrete or field.many_to_many:
+            raise FieldError(f"Invalid field name: {key}")
+        if not field.primary_key:
+            update_fields.append(field.name)
+    return update_fields
+
+
+def bulk_upsert(model, rows: list[dict], batch_size: int) -> tuple[set, set]:
+    """
+    Insert or update rows of a single model. Returns 2-tuple of IDs
+    of (created, updated) objects, the other rows didn't change.
+
+    All rows must contain the same keys, so that only fields present
+    in the feed are overwritten, same as with update_or_create.
+    Current values of those fields are loaded with one query and rows
+    equal to them are skipped, so re-importing an unchanged feed doesn't
+    write anything. Changed rows are written with bulk_update, because
+    a partial row would violate NOT NULL constraints of an INSERT even
+    if it ends up as an update. New rows are written with INSERT ...
+    ON CONFLICT, so rows inserted concurrently by another import are
+    updated instead.
+
+    :param model: Model class
+    :param rows: Translated rows, each containing the "id" key
+    :param batch_size: Maximum number of rows written by one query
+    """
+    update_fields = get_update_fields(model, rows[0])
+    attnames = [model._meta.get_field(name).attname for name in update_fields]
+
+    db = router.db_for_write(model)
+    manager = model.objects.using(db)
+    current = {
+        values[0]: values[1:]
+        for values in manager.filter(
+            pk__in=[row["id"] for row in rows]
+        ).values_list("pk", *attnames)
+    }
+    new_objs = [model(**row) for row in rows if row["id"] not in current]
+    changed_objs = [
+        model(**row)
+        for row in rows
+        if row["id"] in current
+        and tuple(row[attname] for attname in attnames) != current[row["id"]]
+    ]
+
+    # bulk_update doesn't set auto_now fields
+    tracked = issubclass(model, TrackedModel)
+    if tracked and update_fields and "updated_on" not in update_fields:
+        now = timezone.now()
+        for obj in new_objs + changed_objs:
+            obj.updated_on = now
+        update_fields.append("updated_on")
+
+    if update_fields:
+        if changed_objs:
+            manager.bulk_update(
+                changed_objs, update_fields, batch_size=batch_size
+            )
+        if new_objs:
+            features = connections[db].features
+            manager.bulk_create(
+                new_objs,
+                batch_size=batch_size,
+                update_conflicts=True,
+                update_fields=update_fields,
+                unique_fields=(
+                    ["id"] if features.supports_update_conflicts_with_target
+                    else None
+                ),
+            )
+    elif new_objs:
+        # Nothing to update, only make sure the rows exist.
+        manager.bulk_create(
+            new_objs, batch_size=batch_size, ignore_conflicts=True
+        )
+
+    return {obj.pk for obj in new_objs}, {obj.pk for obj in changed_objs}
+
+
+def sync_many_to_many(
+    model, field_name: str, relations: dict, batch_size: int
+) -> set:
+    """
+    Set related objects of many-to-many relations of several objects
+    at once: load their current links with one query, then delete the
+    removed links and insert the added ones with INSERT ... ON CONFLICT
+    DO NOTHING, batch_size links per query, instead of a set() call
+    per object.
+    Returns IDs of the objects whose links changed.
+
+    :param model: Model class
+    :param field_name: Name of the many-to-many field
+    :param relations: Lists of related IDs by object ID, an empty list
+        removes all links of the object
+    :param batch_size: Maximum number of links deleted or inserted
+        by one query
+    """
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+
+    wanted = {
+        (pk, related) for pk, ids in relations.items() for related in ids
+    }
+    current = {
+        (pk, related): link_pk
+        for link_pk, pk, related in through.objects.filter(
+            **{f"{source}__in": list(relations)}
+        ).values_list("pk", source, target)
+    }
+
+    removed = [
+        link_pk for key, link_pk in current.items() if key not in wanted
+    ]
+    for chunk in iter_chunks(removed, batch_size):
+        through.objects.filter(pk__in=chunk).delete()
+    added = [
+        through(**{source: pk, target: related})
+        for pk, related in wanted
+        if (pk, related) not in current
+    ]
+    if added:
+        through.objects.bulk_create(
+            added, batch_size=batch_size, ignore_conflicts=True
+        )
+    return {pk for pk, _ in current.keys() - wanted} | {
+        getattr(link, source) for link in added
+    }
+
+
+class Importer:
+    """
+    Buffer imported rows per model and write them in batches.
+
+    Rows with the same ID are merged, later rows overriding earlier ones,
+    which gives the same end result as calling update_or_create row by row.
+
+    Buffers are flushed in topological order of the models, see
+    get_import_order. Before writing, IDs referenced by the rows are
+    checked with one query per referenced model. Rows referencing objects
+    which don't exist yet are deferred until the end of the payload,
+    so the feed may list objects in any order.
+
+    By default every query is committed on its own and the import stops
+    at the first invalid row. With ``atomic`` set to ATOMIC_PAYLOAD or
+    ATOMIC_CHUNK the whole payload or every flushed chunk is written
+    in one transaction. Invalid rows are then rolled back to a savepoint
+    and collected in ``errors`` instead of stopping the import.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        on_flush: Optional[Callable[["Importer"], None]] = None,
+        atomic: Optional[str] = None,
+    ):
+        """
+        :param batch_size: Number of rows written per query,
+            defaults to settings.IMPORT_BATCH_SIZE
+        :param on_flush: Called with the importer after each flush,
+            used for progress reporting
+        :param atomic: None, ATOMIC_PAYLOAD or ATOMIC_CHUNK
+        """
+        if atomic not in (None, *ATOMIC_MODES):
+            raise ValueError(f"Invalid atomic mode: {atomic}")
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.on_flush = on_flush
+        self.atomic = atomic
+        self.buffers: dict[type[Model], dict] = {}
+        self.deferred: dict[type[Model], dict] = {}
+        self.known: dict[type[Model], set] = {}
+        self.changed: set[type[Model]] = set()
+        self.written: dict[type[Model], set] = {}
+        # IDs of rows changed in the current import transaction
+        self.stamped: dict[type[Model], set] = {}
+        self.created: dict[str, int] = {}
+        self.updated: dict[str, int] = {}
+        self.unchanged: dict[str, int] = {}
+        self.errors: list[dict] = []
+        self.error_count = 0
+        self.index = 0
+        self.invalid: set[int] = set()
+        self.validating = False
+
+    @property
+    def collect_errors(self) -> bool:
+        """
+        Whether invalid rows are collected instead of stopping the import.
+        Validation always collects all of them.
+        """
+        return self.atomic is not None or self.validating
+
+    def add_error(self, indexes: list[int], model_name, error: str) -> None:
+        """
+        Record an invalid row, or raise if errors are not collected.
+
+        :param indexes: Positions of the row (and rows merged
+            into it) in the payload
+        :param model_name: Name of the model, if known
+        :param error: Error message
+        :raises ImportDataError: If errors are not collected
+        """
+        if not self.collect_errors:
+            raise ImportDataError(error)
+
+        if self.validating:
+            self.invalid.update(indexes)
+        for index in indexes:
+            self.error_count += 1
+            if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+                self.errors.append(
+                    {"index": index, "model": model_name, "error": error}
+                )
+
+    def parse(
+        self, obj_dict: dict, index: int
+    ) -> Optional[tuple[type[Model], dict]]:
+        """
+        Return the model and translated row of one ``{"Model": {...}}``
+        item, or None if the item is not valid.
+
+        :param obj_dict: Dictionary with a single model name key
+        :param index: Position of the item in the payload
+        :raises ImportDataError: If the item is not valid
+            and errors are not collected
+        """
+        if not isinstance(obj_dict, dict) or not obj_dict:
+            self.add_error([index], None, f"Invalid item: {obj_dict!r}")
+            return None
+
+        # Get model name from the first key in the dictionary
+        source_name = next(iter(obj_dict))
+        plan = get_translation_plan(source_name)
+        if not plan:
+            model_name = swap_string(source_name)
+            self.add_error(
+                [index], model_name, f"Invalid model name: {model_name}"
+            )
+            return None
+        model_name = plan.model_name
+
+        obj_data = next(iter(obj_dict.values()))
+        if not isinstance(obj_data, dict):
+            self.add_error(
+                [index], model_name, f"Invalid data for {model_name}"
+            )
+            return None
+        try:
+            obj_data = plan.translate(obj_data)
+        except (FieldError, ValidationError) as e:
+            self.add_error(
+                [index], model_name, f"Invalid data for {model_name}: {e}"
+            )
+            return None
+        if not obj_data.get("id"):
+            self.add_error(
+                [index], model_name, f"Missing ID for {model_name}"
+            )
+            return None
+        return plan.model, obj_data
+
+    def add(self, obj_dict: dict) -> None:
+        """
+        Add one ``{"Model": {...}}`` item to the import.
+        Items found invalid by validate are skipped.
+
+        :param obj_dict: Dictionary with a single model name key
+        :raises ImportDataError: If the item is not valid
+            and errors are not collected
+        """
+        index = self.index
+        self.index += 1
+        if index in self.invalid:
+            return
+
+        parsed = self.parse(obj_dict, index)
+        if parsed is None:
+            return
+        model, obj_data = parsed
+        pk = obj_data["id"]
+
+        # A deferred row must not be overwritten by its older version
+        # written later, so newer rows are merged into it instead.
+        deferred = self.deferred.get(model, {})
+        buffer = deferred if pk in deferred else (
+            self.buffers.setdefault(model, {})
+        )
+        data, indexes = buffer.setdefault(pk, ({}, []))
+        data.update(obj_data)
+        indexes.append(index)
+
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        """
+        Write all buffered rows to the database, deferring rows
+        which reference objects that don't exist yet.
+
+        :param final: Write deferred rows too and report those which
+            still reference missing objects
+        :raises ImportDataError: If the database rejects the data
+            and errors are not collected
+        """
+        with (
+            transaction.atomic() if self.atomic == ATOMIC_CHUNK
+            else nullcontext()
+        ):
+            for model in get_import_order():
+                buffer = self.buffers.get(model)
+                if buffer:
+                    self.write_resolved(model, buffer, final)
+                    buffer.clear()
+                deferred = self.deferred.get(model)
+                if final and deferred:
+                    self.write_resolved(model, deferred, final)
+                    deferred.clear()
+
+            if self.atomic == ATOMIC_CHUNK:
+                self.restamp()
+            # Invalidates cached responses of the changed models
+            bump_versions(self.changed)
+            self.changed.clear()
+
+        if self.on_flush:
+            self.on_flush(self)
+
+    def resolve(self, model, rows: list[dict]) -> None:
+        """
+        Load IDs referenced by rows which are not known to exist yet,
+        using one query per referenced model and batch_size IDs.
+
+        :param model: Model class
+        :param rows: Translated rows
+        """
+        wanted: dict[type[Model], set] = {}
+        for key, target in get_references(model).items():
+            known = self.known.setdefault(target, set())
+            for row in rows:
+                for value in self.iter_references(row, key, target):
+                    if value not in known:
+                        wanted.setdefault(target, set()).add(value)
+
+        for target, ids in wanted.items():
+            for chunk in iter_chunks(ids, self.batch_size):
+                self.known[target].update(
+                    target.objects.filter(pk__in=chunk).values_list(
+                        "pk", flat=True
+                    )
+                )
+
+    @staticmethod
+    def iter_references(row: dict, key: str, target) -> Iterable:
+        """
+        Yield IDs referenced by the given key of a row, skipping values
+        which are not valid IDs; those are reported when writing the row.
+
+        :param row: Translated row
+        :param key: Key referencing other objects, e.g. "name_id"
+        :param target: Referenced model
+        """
+        value = row.get(key)
+        values = value if isinstance(value, list) else [value]
+        for value in values:
+            if value is None:
+                continue
+            try:
+                yield target._meta.pk.to_python(value)
+            except ValidationError:
+                continue
+
+    def get_missing(self, model, row: dict) -> list[str]:
+        """
+        Return descriptions of objects referenced by a row which don't exist.
+
+        :param model: Model class
+        :param row: Translated row
+        """
+        return [
+            f"{target._meta.verbose_name.capitalize()} with ID {value} "
+            f"does not exist"
+            for key, target in get_references(model).items()
+            for value in self.iter_references(row, key, target)
+            if value not in self.known[target]
+        ]
+
+    def write_resolved(self, model, buffer: dict, final: bool) -> None:
+        """
+        Write buffered rows of one model whose references exist.
+        Other rows are deferred, or reported if this is the final flush.
+
+        :param model: Model class
+        :param buffer: Buffered rows by ID
+        :param final: Whether this is the final flush
+        """
+        self.resolve(model, [data for data, _ in buffer.values()])
+
+        ready = []
+        for pk, (data, indexes) in buffer.items():
+            missing = self.get_missing(model, data)
+            if not missing:
+                ready.append((data, indexes))
+            elif final:
+                self.add_error(
+                    indexes,
+                    model.__name__,
+                    f"Invalid data for {model.__name__}: {missing[0]}",
+                )
+            else:
+                self.deferred.setdefault(model, {})[pk] = (data, indexes)
+
+        if ready:
+            self.write(model, ready)
+
+    @property
+    def processed(self) -> dict[str, int]:
+        """
+        Number of rows written or found unchanged so far per model name.
+        """
+        return {
+            model_name: created
+            + self.updated.get(model_name, 0)
+            + self.unchanged.get(model_name, 0)
+            for model_name, created in self.created.items()
+        }
+
+    @property
+    def counts(self) -> dict[str, dict[str, int]]:
+        """
+        Numbers of created, updated and unchanged rows per model name.
+        """
+        return {
+            model_name: {
+                "created": created,
+                "updated": self.updated.get(model_name, 0),
+                "unchanged": self.unchanged.get(model_name, 0),
+            }
+            for model_name, created in self.created.items()
+        }
+
+    def write(self, model, rows: list[tuple[dict, list[int]]]) -> None:
+        """
+        Write buffered rows of one model. When collecting errors,
+        the rows are written in a savepoint and if that fails,
+        they are retried one by one to find the invalid ones.
+
+        :param model: Model class
+        :param rows: Buffered 2-tuples of (row, indexes in the payload)
+        :raises ImportDataError: If the database rejects the data
+            and errors are not collected
+        """
+        model_name = model.__name__
+
+        if not self.collect_errors:
+            try:
+                self.upsert(model, [data for data, _ in rows])
+            except DATA_ERRORS as e:
+                raise ImportDataError(f"Invalid data for {model_name}: {e}")
+            return
+
+        try:
+            with transaction.atomic():
+                self.upsert(model, [data for data, _ in rows], check=True)
+            return
+        except DATA_ERRORS:
+            pass
+
+        for data, indexes in rows:
+            try:
+                with transaction.atomic():
+                    self.upsert(model, [data], check=True)
+            except DATA_ERRORS as e:
+                self.add_error(
+                    indexes, model_name, f"Invalid data for {model_name}: {e}"
+                )
+
+    def upsert(self, model, rows: list[dict], check: bool = False) -> None:
+        """
+        Upsert rows of one model, grouped by the set of provided fields,
+        and update their many-to-many relations.
+
+        :param model: Model class
+        :param rows: Translated rows
+        :param check: Check deferred foreign key constraints right away,
+            so that violations are raised inside the current savepoint
+        """
+        model_name = model.__name__
+        groups: dict[frozenset, list[dict]] = {}
+        relations: dict[str, dict] = {}
+
+        for row in rows:
+            row = dict(row)
+            for key, field_name in M2M_KEYS.items():
+                ids = row.pop(key, None)
+                # An empty list removes all related objects
+                if ids is not None:
+                    relations.setdefault(field_name, {})[row["id"]] = ids
+            groups.setdefault(frozenset(row), []).append(row)
+
+        # Documents of products losing a link change too
+        linked = get_linked_products(model, rows)
+
+        created: set = set()
+        updated: set = set()
+        for group in groups.values():
+            group_created, group_updated = bulk_upsert(
+                model, group, self.batch_size
+            )
+            created |= group_created
+            updated |= group_updated
+
+        relinked: set = set()
+        for field_name, field_relations in relations.items():
+            field_relinked = sync_many_to_many(
+                model, field_name, field_relations, self.batch_size
+            )
+            if field_relinked:
+                relinked |= field_relinked
+                # No m2m_changed signal is sent, see core.versions
+                field = model._meta.get_field(field_name)
+                self.changed.add(field.remote_field.through)
+
+        # Objects whose links changed only are updated too, so that
+        # they appear in the change feed, see core.changes
+        relinked -= created | updated
+        if relinked and issubclass(model, TrackedModel):
+            now = timezone.now()
+            for chunk in iter_chunks(relinked, self.batch_size):
+                model.objects.filter(pk__in=chunk).update(updated_on=now)
+        updated |= relinked
+
+        if check:
+            connection = connections[router.db_for_write(model)]
+            connection.check_constraints(
+                table_names=[model._meta.db_table]
+                + [
+                    field.remote_field.through._meta.db_table
+                    for field in model._meta.many_to_many
+                ]
+            )
+
+        unchanged = len(rows) - len(created) - len(updated)
+        for counts, count in [
+            (self.created, len(created)),
+            (self.updated, len(updated)),
+            (self.unchanged, unchanged),
+        ]:
+            counts[model_name] = counts.get(model_name, 0) + count
+        self.known.setdefault(model, set()).update(row["id"] for row in rows)
+        if created or updated:
+            self.written.setdefault(model, set()).update(created, updated)
+            self.changed.add(model)
+            if self.atomic and issubclass(model, TrackedModel):
+                self.stamped.setdefault(model, set()).update(
+                    created, updated
+                )
+        products = {linked[pk] for pk in updated if pk in linked}
+        if products:
+            self.written.setdefault(Product, set()).update(products)
+
+    def restamp(self) -> None:
+        """
+        Set updated_on of rows changed in the current transaction to the
+        current time right before it commits. The change feed leaves out
+        only rows changed within CHANGES_SAFETY_WINDOW, so rows stamped
+        at the start of a longer transaction would be missed by clients
+        which read later changes meanwhile, see core.changes.
+        """
+        now = timezone.now()
+        for model, ids in self.stamped.items():
+            for chunk in iter_chunks(ids, self.batch_size):
+                model.objects.filter(pk__in=chunk).update(updated_on=now)
+        self.stamped.clear()
+
+    def validate(self, items: Iterable[dict]) -> None:
+        """
+        Check all items without writing anything. Every invalid row
+        is collected in ``errors`` and its position in ``invalid``,
+        so that a following run skips it.
+
+        Rows are translated, which checks their values against the model
+        fields, and rows creating new objects must contain all required
+        fields. Referenced IDs must exist in the database or belong
+        to valid rows of the payload. The database is queried once per
+        model (in chunks of batch_size IDs) for both the imported and
+        the referenced IDs, and the existing ones are remembered,
+        so the import doesn't look them up again.
+
+        :param items: Iterable of ``{"Model": {...}}`` dictionaries
+        """
+        # Model -> ID -> (keys, positions in the payload, references)
+        rows: dict[type[Model], dict[object, tuple]] = {}
+        # Equal key sets of many rows are stored once
+        key_sets: dict[frozenset, frozenset] = {}
+
+        self.validating = True
+        try:
+            for index, obj_dict in enumerate(items):
+                parsed = self.parse(obj_dict, index)
+                if parsed is None:
+                    continue
+                model, data = parsed
+                keys, indexes, references = rows.setdefault(
+                    model, {}
+                ).setdefault(data["id"], (frozenset(), [], {}))
+                keys = keys.union(data)
+                indexes.append(index)
+                for key, target in get_references(model).items():
+                    if key in data:
+                        references[key] = tuple(
+                            self.iter_references(data, key, target)
+                        )
+                rows[model][data["id"]] = (
+                    key_sets.setdefault(keys, keys),
+                    indexes,
+                    references,
+                )
+
+            wanted: dict[type[Model], set] = {}
+            for model, objects in rows.items():
+                wanted.setdefault(model, set()).update(objects)
+                targets = get_references(model)
+                for _, _, references in objects.values():
+                    for key, values in references.items():
+                        wanted.setdefault(targets[key], set()).update(values)
+            for model, ids in wanted.items():
+                known = self.known.setdefault(model, set())
+                for chunk in iter_chunks(ids - known, self.batch_size):
+                    known.update(
+                        model.objects.filter(pk__in=chunk).values_list(
+                            "pk", flat=True
+                        )
+                    )
+
+            # Referenced rows are checked first, so that rows referencing
+            # an invalid row of the payload are reported too.
+            for model in get_import_order():
+                objects = rows.get(model)
+                if objects:
+                    self.validate_rows(model, objects, rows)
+        finally:
+            self.validating = False
+        self.errors.sort(key=lambda error: error["index"])
+
+    def validate_rows(self, model, objects: dict, rows: dict) -> None:
+        """
+        Report rows of one model which would create an object without
+        required fields or which reference missing objects, and remove
+        them from the valid rows.
+
+        :param model: Model class
+        :param objects: Valid rows of the model by ID
+        :param rows: Valid rows of all models, referenced rows
+            must be validated already
+        """
+        model_name = model.__name__
+        required = get_required_fields(model)
+        targets = get_references(model)
+        known = self.known[model]
+
+        for pk, (keys, indexes, references) in list(objects.items()):
+            if pk not in known and not required <= keys:
+                missing = ", ".join(sorted(required - keys))
+                error = f"Missing fields of a new object: {missing}"
+            else:
+                error = self.get_missing_reference(targets, references, rows)
+            if error:
+                self.add_error(
+                    indexes,
+                    model_name,
+                    f"Invalid data for {model_name}: {error}",
+                )
+                del objects[pk]
+
+    def get_missing_reference(
+        self, targets: dict, references: dict, rows: dict
+    ) -> Optional[str]:
+        """
+        Return description of the first referenced object which neither
+        exists nor is imported by a valid row, or None.
+
+        :param targets: Referenced models by key, see get_references
+        :param references: Referenced IDs by key
+        :param rows: Valid rows of the payload by model and ID
+        """
+        for key, values in references.items():
+            target = targets[key]
+            for value in values:
+                if value not in self.known[target] and value not in rows.get(
+                    target, ()
+                ):
+                    return (
+                        f"{target._meta.verbose_name.capitalize()} "
+                        f"with ID {value} does not exist"
+                    )
+        return None
+
+    def run(self, items: Iterable[dict]) -> None:
+        """
+        Import all items and flush the remaining buffers.
+
+        :param items: Iterable of ``{"Model": {...}}`` dictionaries
+        :raises ImportDataError: If any item is not valid
+            and errors are not collected
+        """
+        start = time.perf_counter()
+        try:
+            with (
+                transaction.atomic() if self.atomic == ATOMIC_PAYLOAD
+                else nullcontext()
+            ):
+                for obj_dict in items:
+                    self.add(obj_dict)
+                self.flush(final=True)
+                if self.atomic == ATOMIC_PAYLOAD:
+                    self.restamp()
+        finally:
+            # Rows written before an error stay in the database
+            # unless the whole payload was rolled back.
+            rebuild_documents(get_affected_catalogs(self.written))
+            metrics.observe_import(self.counts, time.perf_counter() - start)
+        self.errors.sort(key=lambda error: error["index"])
+
+    def run_validated(
+        self, open_items: Callable[[], Iterable[dict]], dry_run: bool = False
+    ) -> None:
+        """
+        Validate the whole payload, then import it. Without ``atomic``
+        nothing is imported if any row is invalid, otherwise invalid rows
+        are skipped. Errors of both passes are collected in ``errors``.
+
+        :param open_items: Returns a new iterable of the payload's items,
+            called once per pass
+        :param dry_run: Only validate the payload
+        :raises ImportDataError: If the database rejects the data
+            and errors are not collected
+        """
+        self.validate(open_items())
+        if dry_run or (self.error_count and not self.collect_errors):
+            return
+        self.run(open_items())
@@ -0,0 +1,130 @@
+"""
+Background import jobs.
+
+Jobs run in a thread pool local to the web process, so no external
+broker is needed. Job state is stored in the database, which makes it
+visible to every web worker. Jobs queued in a process which gets
+restarted are not resumed.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction, close_old_connections, connections
+from django.utils import timezone
+
+from core.importer import Importer, ImportDataError
+from core.models import ImportJob
+from core.parsers import iter_items
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMPORT_JOB_WORKERS, thread_name_prefix="import"
+)
+
+
+def create_import_job(
+    stream,
+    content_type: str,
+    batch_size: Optional[int] = None,
+    atomic: Optional[str] = None,
+) -> ImportJob:
+    """
+    Store the payload and queue the import. The job is started once
+    the current transaction is committed.
+
+    :param stream: Binary file-like object with the payload
+    :param content_type: Content type of the payload
+    :param batch_size: Number of rows written per query
+    :param atomic: Transaction mode, see core.importer.Importer
+    """
+    job = ImportJob(
+        content_type=content_type, batch_size=batch_size, atomic=atomic
+    )
+    job.payload.save(f"{job.id}.json", File(stream), save=False)
+    job.save()
+    transaction.on_commit(lambda: executor.submit(run_in_thread, job.id))
+    return job
+
+
+def run_in_thread(job_id) -> None:
+    """
+    Run an import job in a worker thread, which uses and afterwards
+    closes its own database connections.
+
+    :param job_id: ID of the ImportJob
+    """
+    close_old_connections()
+    try:
+        run_import_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_import_job(job_id) -> None:
+    """
+    Run a queued import job, storing its progress after every flush.
+
+    :param job_id: ID of the ImportJob
+    """
+    try:
+        job = ImportJob.objects.get(pk=job_id)
+        job.status = ImportJob.Status.RUNNING
+        job.started_on = timezone.now()
+        job.save(update_fields=["status", "started_on"])
+
+        def save_progress(importer: Importer) -> None:
+            job.processed = importer.processed
+            job.save(update_fields=["processed"])
+
+        importer = Importer(
+            batch_size=job.batch_size,
+            on_flush=save_progress,
+            atomic=job.atomic,
+        )
+        try:
+            with job.payload.open("rb") as payload:
+
+                def open_items():
+                    payload.seek(0)
+                    return iter_items(payload, job.content_type)
+
+                importer.run_validated(open_items)
+        except json.JSONDecodeError:
+            job.status = ImportJob.Status.ERROR
+            job.error = "Invalid JSON"
+        except ImportDataError as e:
+            job.status = ImportJob.Status.ERROR
+            job.error = str(e)
+        else:
+            if importer.errors:
+                job.status = ImportJob.Status.ERROR
+                job.error = importer.errors[0]["error"]
+            else:
+                job.status = ImportJob.Status.SUCCESS
+
+        job.processed = importer.processed
+        job.error_count = importer.error_count
+        job.finished_on = timezone.now()
+        job.save(
+            update_fields=[
+                "status",
+                "error",
+                "error_count",
+                "processed",
+                "finished_on",
+            ]
+        )
+        if job.status == ImportJob.Status.SUCCESS:
+            job.payload.delete()
+    except Exception:
+        logger.exception("Import job %s failed", job_id)
+        ImportJob.objects.filter(pk=job_id).update(
+            status=ImportJob.Status.ERROR,
+            error="Internal error",
+            finished_on=timezone.now(),
+        )
@@ -0,0 +1,399 @@
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test import override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Metrics compared with the baseline, True if higher values are better
+COMPARED_METRICS = {
+    "rows_per_second": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "queries": False,
+}
+
+
+def generate_payload(
+    products: int,
+    attributes: int,
+    images: int,
+    catalogs: int,
+    seed: int = 0,
+) -> list[dict]:
+    """
+    Generate an import payload of a synthetic catalog using the import
+    keys of IMPORT_MAPPING, like data.json.
+
+    :param products: Number of products
+    :param attributes: Number of attributes per product
+    :param images: Number of images per product
+    :param catalogs: Number of catalogs the products are split into
+    :param seed: Seed of the random values
+    """
+    rng = random.Random(seed)
+    names = max(attributes, 1) * 2
+    values = 10
+    published_on = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    items = []
+    for pk in range(1, names + 1):
+        items.append(
+            {"AttributeName": {"id": pk, "nazev": f"Parametr {pk}",
+                               "kod": f"parametr{pk}", "zobrazit": True}}
+        )
+    for pk in range(1, values + 1):
+        items.append({"AttributeValue": {"id": pk, "hodnota": f"{pk}"}})
+    for pk in range(1, names * values + 1):
+        items.append(
+            {"Attribute": {"id": pk,
+                           "nazev_atributu_id": (pk - 1) // values + 1,
+                           "hodnota_atributu_id": (pk - 1) % values + 1}}
+        )
+
+    for pk in range(1, products + 1):
+        items.append(
+            {"Product": {
+                "id": pk,
+                "nazev": f"Produkt {pk}",
+                "description": f"Popis produktu {pk}",
+                "cena": f"{rng.randint(100, 100000) / 100:.2f}",
+                "mena": rng.choice(["CZK", "EUR", "USD"]),
+                "published_on": (
+                    published_on + timedelta(hours=pk)
+                ).isoformat(),
+                "is_published": rng.random() < 0.9,
+            }}
+        )
+        for number, name in enumerate(rng.sample(range(names), attributes)):
+            attribute_id = name * values + rng.randint(1, values)
+            items.append(
+                {"ProductAttributes": {
+                    "id": (pk - 1) * attributes + number + 1,
+                    "attribute": attribute_id,
+                    "product": pk,
+                }}
+            )
+        for number in range(images):
+            image_id = (pk - 1) * images + number + 1
+            items.append(
+                {"Image": {
+                    "id": image_id,
+                    "nazev": f"Obrázek {image_id}",
+                    "obrazek": f"https://example.com/{image_id}.jpg",
+                }}
+            )
+            items.append(
+                {"ProductImage": {
+                    "id": image_id,
+                    "nazev": f"Obrázek {number + 1}",
+                    "obrazek_id": image_id,
+                    "product": pk,
+                }}
+            )
+
+    for pk in range(1, catalogs + 1):
+        items.append(
+            {"Catalog": {
+                "id": pk,
+                "nazev": f"Katalog {pk}",
+                "obrazek_id": pk if pk <= products * images else None,
+                "products_ids": list(range(pk, products + 1, catalogs)),
+                "attributes_ids": rng.sample(
+                    range(1, names * values + 1), min(5, names * values)
+                ),
+            }}
+        )
+    return items
+
+
+class BenchmarkRouter:
+    """
+    Database router sending all queries to the benchmarked database.
+
+    :param alias: Alias of the database
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    def db_for_read(self, model, **hints) -> str:
+        return self.alias
+
+    def db_for_write(self, model, **hints) -> str:
+        return self.alias
+
+
+def measure_import(
+    client: Client, payload: bytes, rows: int, alias: str
+) -> dict:
+    """
+    Import the payload with one request and return its throughput.
+
+    :param client: Test client
+    :param payload: JSON payload
+    :param rows: Number of rows of the payload
+    :param alias: Alias of the benchmarked database
+    """
+    with CaptureQueriesContext(connections[alias]) as queries:
+        start = time.perf_counter()
+        response = client.post(
+            reverse("import_objects"),
+            data=payload,
+            content_type="application/json",
+        )
+        seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise CommandError(f"Import failed: {response.content.decode()}")
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1),
+        "queries": len(queries),
+    }
+
+
+def measure_requests(client: Client, urls: list[str], alias: str) -> dict:
+    """
+    Request every URL with an empty response cache and return latency
+    percentiles and the maximum number of queries per request.
+
+    :param client: Test client
+    :param urls: URLs to request
+    :param alias: Alias of the benchmarked database
+    """
+    latencies = []
+    query_counts = []
+    for url in urls:
+        caches[settings.RESPONSE_CACHE].clear()
+        with CaptureQueriesContext(connections[alias]) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise CommandError(f"Request of {url} failed")
+        query_counts.append(len(queries))
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(urls),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "queries": max(query_counts),
+    }
+
+
+def run_benchmark(
+    products: int,
+    attributes: int,
+    images: int,
+    catalogs: int,
+    requests: int,
+    alias: str = DEFAULT_DB_ALIAS,
+) -> dict:
+    """
+    Import a synthetic catalog into the database, import it again
+    unchanged and measure list and detail requests. Queries are counted
+    on the given database, which the app must be routed to.
+
+    :param products: Number of products
+    :param attributes: Number of attributes per product
+    :param images: Number of images per product
+    :param catalogs: Number of catalogs
+    :param requests: Number of requests per read scenario
+    :param alias: Alias of the benchmarked database
+    """
+    items = generate_payload(products, attributes, images, catalogs)
+    payload = json.dumps(items).encode()
+    client = Client()
+
+    results = {
+        "import": measure_import(client, payload, len(items), alias),
+        "reimport": measure_import(client, payload, len(items), alias),
+    }
+
+    list_url = reverse("model_list", args=["product"])
+    results["list"] = measure_requests(
+        client, [f"{list_url}?limit=100" for _ in range(requests)], alias
+    )
+    results["list_expanded"] = measure_requests(
+        client,
+        [f"{list_url}?limit=20&expand=attributes.name,attributes.value"
+         for _ in range(requests)],
+        alias,
+    )
+    results["detail"] = measure_requests(
+        client,
+        [reverse("object_detail", args=["product", pk % products + 1])
+         for pk in range(requests)],
+        alias,
+    )
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Return descriptions of metrics worse than in the baseline by more
+    than the tolerance. Query counts must not grow at all.
+
+    :param results: Results of the current run
+    :param baseline: Results of the baseline run
+    :param tolerance: Allowed relative change, e.g. 0.2 for 20 %
+    """
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before = baseline.get(scenario, {}).get(metric)
+            after = metrics.get(metric)
+            if before is None or after is None:
+                continue
+            allowed = 0 if metric == "queries" else tolerance
+            if higher_is_better:
+                worse = after < before * (1 - allowed)
+            else:
+                worse = after > before * (1 + allowed)
+            if worse:
+                regressions.append(
+                    f"{scenario} {metric}: {before} -> {after}"
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark import, list and detail requests on a synthetic "
+        "catalog. A temporary test database is created, so any database "
+        "including SQLite can be used and existing data is not touched. "
+        "Only the database selected by --database is created and used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products", type=int, default=1000, help="Number of products"
+        )
+        parser.add_argument(
+            "--attributes",
+            type=int,
+            default=5,
+            help="Number of attributes per product",
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=2,
+            help="Number of images per product",
+        )
+        parser.add_argument(
+            "--catalogs", type=int, default=10, help="Number of catalogs"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of requests per read scenario",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Alias of the benchmarked database, e.g. sqlite",
+        )
+        parser.add_argument(
+            "-o", "--output", help="Write results to this JSON file"
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Fail if results are worse than in this JSON file",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative slowdown compared to the baseline",
+        )
+
+    def handle(self, *args, **options):
+        if options["products"] < 1 or options["requests"] < 2:
+            raise CommandError("At least 1 product and 2 requests are needed")
+
+        alias = options["database"]
+        if alias not in connections:
+            raise CommandError(f"Unknown database: {alias}")
+        # Test databases depend on the default one unless set otherwise,
+        # which would need it to be created too
+        test_settings = connections[alias].settings_dict["TEST"]
+        test_settings.setdefault("DEPENDENCIES", [])
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={alias}
+        )
+        try:
+            with override_settings(
+                DATABASE_ROUTERS=[BenchmarkRouter(alias)]
+            ):
+                results = run_benchmark(
+                    options["products"],
+                    options["attributes"],
+                    options["images"],
+                    options["catalogs"],
+                    options["requests"],
+                    alias,
+                )
+            vendor = connections[alias].vendor
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "parameters": {
+                key: options[key]
+                for key in [
+                    "products", "attributes", "images", "catalogs", "requests"
+                ]
+            },
+            "database": vendor,
+            "alias": alias,
+            "results": results,
+            # Kilobytes on Linux, bytes on macOS
+            "peak_memory": (
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                if resource else None
+            ),
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(
+                results, baseline["results"], options["tolerance"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions found:\n" + "\n".join(regressions)
+                )
@@ -0,0 +1,65 @@
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.forms import model_to_dict
+
+from core.models import Attribute, AttributeName, Image, Product
+from core.serializers import get_serializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure serialization cost per object of model_to_dict "
+        "and of the compiled serializers. No database is used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=int,
+            default=100000,
+            help="Number of serialized objects per measurement",
+        )
+
+    def handle(self, *args, number, **options):
+        now = datetime.now(timezone.utc)
+        objs = [
+            AttributeName(
+                id=1, name="Color", code="color", display=True,
+                updated_on=now,
+            ),
+            Attribute(id=1, name_id=1, value_id=2, updated_on=now),
+            Image(
+                id=1, name="Photo", url="https://example.com/1.jpg",
+                updated_on=now,
+            ),
+            Product(
+                id=1, name="Product", description="Description",
+                price=Decimal("100.00"), currency="CZK",
+                published_on=now, is_published=True, updated_on=now,
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'model':<16}{'model_to_dict':>16}{'serializer':>16}"
+            f"{'speedup':>10}"
+        )
+        for obj in objs:
+            model = type(obj)
+            # Many-to-many fields would need a query, only concrete fields
+            # are compared.
+            fields = [field.name for field in model._meta.concrete_fields]
+            plan = get_serializer(model).get_plan(tuple(fields))
+            before = timeit.timeit(
+                lambda: model_to_dict(obj, fields=fields), number=number
+            )
+            after = timeit.timeit(lambda: plan(obj), number=number)
+            self.stdout.write(
+                f"{model.__name__:<16}"
+                f"{before / number * 1e6:>13.2f} us"
+                f"{after / number * 1e6:>13.2f} us"
+                f"{before / after:>9.1f}x"
+            )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.documents import rebuild_documents
+from core.models import Catalog
+
+
+class Command(BaseCommand):
+    help = "Rebuild precomputed documents of all catalogs."
+
+    def handle(self, *args, **options):
+        count = rebuild_documents(Catalog.objects.values_list("pk", flat=True))
+        self.stdout.write(f"Rebuilt {count} catalog documents")
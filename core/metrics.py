@@ -0,0 +1,394 @@
+"""
+Request and import metrics exported in the Prometheus text format.
+
+MetricsMiddleware records the latency of every request as a histogram
+by route (URL name) and method, the number and total time of its
+database queries, and the size of its response. Queries are measured
+by an execute wrapper installed on every database connection, which
+passes them to the recorder of the current request kept in a context
+variable, so that queries of async views running in the threads of the
+async ORM are counted too. Importers record their rows per model
+and throughput. Requests slower than METRICS_SLOW_REQUEST_MS are logged
+with their slowest queries.
+
+Metrics are kept in memory of the process and exported at /metrics.
+With several worker processes every scrape reports the process which
+served it. Queries of streaming responses run after the response
+is returned by the middleware and are not counted.
+"""
+import heapq
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Number of slowest queries logged with a slow request
+SLOW_REQUEST_QUERIES = 5
+
+
+def escape(value) -> str:
+    """
+    Escape a label value for the Prometheus text format.
+
+    :param value: Label value
+    """
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_labels(**labels) -> str:
+    """
+    Return labels in the Prometheus text format, e.g. ``{route="x"}``.
+    """
+    pairs = ",".join(
+        f'{name}="{escape(value)}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """
+    Counts of observed values in LATENCY_BUCKETS, with their sum.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        :param value: Observed value
+        """
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, **labels) -> list[str]:
+        """
+        Return sample lines of the histogram with cumulative buckets.
+
+        :param name: Metric name
+        :param labels: Labels of the samples
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            cumulative += count
+            lines.append(
+                f"{name}_bucket{format_labels(**labels, le=bound)} "
+                f"{cumulative}"
+            )
+        lines += [
+            f"{name}_bucket{format_labels(**labels, le='+Inf')} "
+            f"{self.count}",
+            f"{name}_sum{format_labels(**labels)} {self.sum}",
+            f"{name}_count{format_labels(**labels)} {self.count}",
+        ]
+        return lines
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and their time
+    and keeping the slowest of them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: list[tuple[float, str]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.seconds += duration
+            if len(self.slowest) < SLOW_REQUEST_QUERIES:
+                heapq.heappush(self.slowest, (duration, sql))
+            else:
+                heapq.heappushpop(self.slowest, (duration, sql))
+
+
+# Recorder of queries of the current request, None outside requests
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar(
+    "current_recorder", default=None
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper passing queries to the recorder
+    of the current request.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """
+    Receiver of connection_created installing record_query. Execute
+    wrappers outlive the connection, so they're installed only once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Metrics:
+    """
+    Metrics of one process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop all recorded values.
+        """
+        with self.lock:
+            self.requests: dict[tuple, int] = {}
+            self.latency: dict[tuple, Histogram] = {}
+            self.queries: dict[str, int] = {}
+            self.query_seconds: dict[str, float] = {}
+            self.response_bytes: dict[str, int] = {}
+            self.import_rows: dict[tuple, int] = {}
+            self.import_rate: dict[str, float] = {}
+
+    def observe_request(
+        self,
+        route: str,
+        method: str,
+        status: int,
+        seconds: float,
+        queries: QueryRecorder,
+        size: Optional[int],
+    ) -> None:
+        """
+        Record a finished request.
+
+        :param route: URL name of the view
+        :param method: HTTP method
+        :param status: Status code of the response
+        :param seconds: Duration of the request
+        :param queries: Queries of the request
+        :param size: Size of the response body, None if streamed
+        """
+        with self.lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((route, method), Histogram()).observe(
+                seconds
+            )
+            self.queries[route] = self.queries.get(route, 0) + queries.count
+            self.query_seconds[route] = (
+                self.query_seconds.get(route, 0.0) + queries.seconds
+            )
+            if size is not None:
+                self.response_bytes[route] = (
+                    self.response_bytes.get(route, 0) + size
+                )
+
+    def observe_import(self, counts: dict, seconds: float) -> None:
+        """
+        Record rows of a finished import.
+
+        :param counts: Numbers of created, updated and unchanged rows
+            per model name, see core.importer.Importer.counts
+        :param seconds: Duration of the import
+        """
+        with self.lock:
+            for model_name, results in counts.items():
+                for result, count in results.items():
+                    key = (model_name, result)
+                    self.import_rows[key] = (
+                        self.import_rows.get(key, 0) + count
+                    )
+                if seconds > 0:
+                    self.import_rate[model_name] = (
+                        sum(results.values()) / seconds
+                    )
+
+    def render(self) -> str:
+        """
+        Return all metrics in the Prometheus text format.
+        """
+        lines = []
+
+        def add(name: str, kind: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(**labels)} {value}")
+
+        with self.lock:
+            add(
+                "whysapi_requests_total",
+                "counter",
+                "Number of requests.",
+                (
+                    ({"route": route, "method": method, "status": status},
+                     count)
+                    for (route, method, status), count in sorted(
+                        self.requests.items()
+                    )
+                ),
+            )
+            name = "whysapi_request_duration_seconds"
+            lines.append(f"# HELP {name} Request latency.")
+            lines.append(f"# TYPE {name} histogram")
+            for (route, method), histogram in sorted(self.latency.items()):
+                lines += histogram.render(name, route=route, method=method)
+            add(
+                "whysapi_db_queries_total",
+                "counter",
+                "Number of database queries of requests.",
+                (({"route": route}, count)
+                 for route, count in sorted(self.queries.items())),
+            )
+            add(
+                "whysapi_db_query_duration_seconds_total",
+                "counter",
+                "Time spent in database queries of requests.",
+                (({"route": route}, seconds)
+                 for route, seconds in sorted(self.query_seconds.items())),
+            )
+            add(
+                "whysapi_response_size_bytes_total",
+                "counter",
+                "Size of non-streaming response bodies.",
+                (({"route": route}, size)
+                 for route, size in sorted(self.response_bytes.items())),
+            )
+            add(
+                "whysapi_import_rows_total",
+                "counter",
+                "Number of imported rows by result.",
+                (({"model": model_name, "result": result}, count)
+                 for (model_name, result), count in sorted(
+                     self.import_rows.items()
+                 )),
+            )
+            add(
+                "whysapi_import_rows_per_second",
+                "gauge",
+                "Throughput of the last import per model.",
+                (({"model": model_name}, rate)
+                 for model_name, rate in sorted(self.import_rate.items())),
+            )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def get_route(request) -> str:
+    """
+    Return URL name of the view which handled the request.
+
+    :param request: HTTP request
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Middleware recording metrics of every request and logging slow ones.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    def record(
+        self, request, response, seconds: float, recorder: QueryRecorder
+    ) -> None:
+        """
+        Record metrics of a finished request and log it if it's slow.
+
+        :param request: HttpRequest
+        :param response: HttpResponse
+        :param seconds: Duration of the request
+        :param recorder: Queries of the request
+        """
+        route = get_route(request)
+        metrics.observe_request(
+            route,
+            request.method,
+            response.status_code,
+            seconds,
+            recorder,
+            None if response.streaming else len(response.content),
+        )
+        if seconds * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries "
+                "taking %.0f ms, slowest:\n%s",
+                request.method,
+                request.get_full_path(),
+                route,
+                seconds * 1000,
+                recorder.count,
+                recorder.seconds * 1000,
+                "\n".join(
+                    f"{duration * 1000:.1f} ms: {sql}"
+                    for duration, sql in sorted(
+                        recorder.slowest, reverse=True
+                    )
+                ),
+            )
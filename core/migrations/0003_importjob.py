@@ -0,0 +1,29 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:27
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_catalog_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('success', 'Success'), ('error', 'Error')], default='pending', max_length=16)),
+                ('payload', models.FileField(upload_to='imports/')),
+                ('content_type', models.CharField(max_length=100)),
+                ('batch_size', models.PositiveIntegerField(null=True)),
+                ('processed', models.JSONField(default=dict)),
+                ('error', models.TextField(null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('started_on', models.DateTimeField(null=True)),
+                ('finished_on', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
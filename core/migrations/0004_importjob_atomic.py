@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='atomic',
+            field=models.CharField(max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='error_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_importjob_atomic'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attributename',
+            name='code',
+            field=models.CharField(db_index=True, max_length=125),
+        ),
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['name', 'value'], name='core_attrib_name_id_0a1abd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_published', 'published_on'], name='core_produc_is_publ_b1e4bb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['published_on'], name='core_produc_publish_0ce54b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['currency'], name='core_produc_currenc_09e471_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='core_produc_price_c510fe_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_updated_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogDocument',
+            fields=[
+                ('catalog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='core.catalog')),
+                ('content', models.TextField()),
+                ('built_on', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from core.search import create_search_index, drop_search_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_catalogdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
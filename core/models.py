@@ -1,33 +1,54 @@
+import uuid
+
 from django.db import models
 
 
-class AttributeName(models.Model):
+class TrackedModel(models.Model):
+    """
+    Model whose objects store the time of their creation and last change,
+    which is also set by the importer. The change time is indexed for
+    the change feed, see core.changes.
+    """
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class AttributeName(TrackedModel):
     name = models.CharField(max_length=125)
-    code = models.CharField(max_length=125)
+    code = models.CharField(max_length=125, db_index=True)
     display = models.BooleanField(default=True)
 
     def __str__(self):
         return self.name
 
 
-class AttributeValue(models.Model):
+class AttributeValue(TrackedModel):
     value = models.CharField(max_length=125)
 
     def __str__(self):
         return self.value
 
 
-class Attribute(models.Model):
+class Attribute(TrackedModel):
     name = models.ForeignKey(AttributeName, on_delete=models.CASCADE)
     value = models.ForeignKey(
         AttributeValue, null=True, on_delete=models.SET_NULL
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "value"]),
+        ]
+
     def __str__(self):
         return self.name.name
 
 
-class Product(models.Model):
+class Product(TrackedModel):
     name = models.CharField(max_length=125)
     description = models.TextField()
     images = models.ManyToManyField("Image", through="ProductImage")
@@ -37,11 +58,19 @@ class Product(models.Model):
     published_on = models.DateTimeField(null=True)
     is_published = models.BooleanField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_published", "published_on"]),
+            models.Index(fields=["published_on"]),
+            models.Index(fields=["currency"]),
+            models.Index(fields=["price"]),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class ProductAttribute(models.Model):
+class ProductAttribute(TrackedModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE)
 
@@ -49,7 +78,7 @@ class ProductAttribute(models.Model):
         return f"{self.product} - {self.attribute}"
 
 
-class Image(models.Model):
+class Image(TrackedModel):
     name = models.CharField(max_length=125, null=True)
     url = models.URLField()
 
@@ -57,7 +86,7 @@ class Image(models.Model):
         return f"Image at {self.url}"
 
 
-class ProductImage(models.Model):
+class ProductImage(TrackedModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     image = models.ForeignKey(Image, on_delete=models.CASCADE)
     name = models.CharField(max_length=125)
@@ -66,7 +95,7 @@ class ProductImage(models.Model):
         return f"Image of {self.product}"
 
 
-class Catalog(models.Model):
+class Catalog(TrackedModel):
     name = models.CharField(max_length=125)
     image = models.ForeignKey(Image, null=True, on_delete=models.SET_NULL)
     products = models.ManyToManyField(Product)
@@ -74,3 +103,65 @@ class Catalog(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class CatalogDocument(models.Model):
+    """
+    Precomputed JSON document of a catalog, see core.documents.
+    """
+
+    catalog = models.OneToOneField(
+        Catalog,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="document",
+    )
+    content = models.TextField()
+    built_on = models.DateTimeField()
+
+    def __str__(self):
+        return f"Document of {self.catalog_id}"
+
+
+class ImportJob(models.Model):
+    """
+    Import running in the background, see core.jobs.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        SUCCESS = "success"
+        ERROR = "error"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    payload = models.FileField(upload_to="imports/")
+    content_type = models.CharField(max_length=100)
+    batch_size = models.PositiveIntegerField(null=True)
+    atomic = models.CharField(max_length=16, null=True)
+    processed = models.JSONField(default=dict)
+    error = models.TextField(null=True)
+    error_count = models.PositiveIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True)
+    finished_on = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+
+class ModelVersion(models.Model):
+    """
+    Version of a model's data, increased whenever its objects change,
+    see core.versions.
+    """
+
+    model = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_on = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.model} v{self.version}"
@@ -0,0 +1,217 @@
+"""
+Keyset (cursor) pagination of list endpoints.
+
+Pages are selected with ``WHERE id > <last id of previous page>`` instead
+of OFFSET, so the cost of a page doesn't grow with its depth. When ordered
+by another field, the cursor holds both the field value and the ID.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, QuerySet
+
+from core.utils import InvalidQueryError
+
+
+def encode_value(value) -> str:
+    """
+    Encode values which are not JSON serializable without losing
+    precision, unlike DjangoJSONEncoder, which truncates microseconds.
+
+    :param value: Datetime, date or Decimal value
+    """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Encode key values of the last row of a page into an opaque cursor.
+
+    :param values: JSON serializable key values
+    """
+    data = json.dumps(
+        values, separators=(",", ":"), default=encode_value
+    ).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decode a cursor created by encode_cursor.
+
+    :param cursor: Cursor from the query string
+    :raises InvalidQueryError: If the cursor is not valid
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (binascii.Error, ValueError):
+        raise InvalidQueryError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list):
+        raise InvalidQueryError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def get_limit(params) -> int:
+    """
+    Return page size requested by ``?limit=``, capped at LIST_MAX_PAGE_SIZE.
+
+    :param params: Query string parameters
+    :raises InvalidQueryError: If the limit is not a positive number
+    """
+    limit = params.get("limit")
+    if limit is None:
+        return settings.LIST_PAGE_SIZE
+    if not limit.isdecimal() or int(limit) < 1:
+        raise InvalidQueryError(f"Invalid limit: {limit}")
+    return min(int(limit), settings.LIST_MAX_PAGE_SIZE)
+
+
+def order_queryset(queryset: QuerySet, ordering: Optional[str]) -> QuerySet:
+    """
+    Order queryset by primary key, or by the given field with NULLs last
+    and then by primary key in the same direction.
+
+    :param queryset: Queryset to order
+    :param ordering: Field name, prefixed with "-" for descending order
+    """
+    if not ordering:
+        return queryset.order_by("pk")
+
+    expression = F(ordering.lstrip("-"))
+    if ordering.startswith("-"):
+        return queryset.order_by(expression.desc(nulls_last=True), "-pk")
+    return queryset.order_by(expression.asc(nulls_last=True), "pk")
+
+
+def get_keyset_filter(field, descending: bool, value, pk) -> Q:
+    """
+    Return condition selecting rows which follow the row with the given
+    value and primary key, in order of (field, pk) with NULLs last.
+
+    :param field: Field the rows are ordered by
+    :param descending: Whether the order is descending
+    :param value: Field value of the last row of the previous page
+    :param pk: Primary key of the last row of the previous page
+    """
+    op = "lt" if descending else "gt"
+    if value is None:
+        return Q(**{f"{field.name}__isnull": True, f"pk__{op}": pk})
+
+    condition = Q(**{f"{field.name}__{op}": value}) | Q(
+        **{field.name: value, f"pk__{op}": pk}
+    )
+    if field.null:
+        condition |= Q(**{f"{field.name}__isnull": True})
+    return condition
+
+
+def paginate(
+    queryset: QuerySet, params, ordering: Optional[str] = None
+) -> dict:
+    """
+    Return one page of a values() queryset as a dictionary
+    with "results" and the "next" cursor, which is None on the last page.
+
+    Rows are ordered by primary key, or by the given field and then
+    by primary key. The rows must contain the field's attname key.
+
+    :param queryset: Queryset returning dictionaries
+    :param params: Query string parameters with optional
+        ``limit`` and ``after`` cursor
+    :param ordering: Field name, prefixed with "-" for descending order
+    :raises InvalidQueryError: If the parameters are not valid
+    """
+    page_queryset, limit = get_page_queryset(queryset, params, ordering)
+    return get_page(list(page_queryset), limit, queryset.model, ordering)
+
+
+async def apaginate(
+    queryset: QuerySet, params, ordering: Optional[str] = None
+) -> dict:
+    """
+    Async version of paginate.
+    """
+    page_queryset, limit = get_page_queryset(queryset, params, ordering)
+    rows = [row async for row in page_queryset]
+    return get_page(rows, limit, queryset.model, ordering)
+
+
+def get_page_queryset(
+    queryset: QuerySet, params, ordering: Optional[str] = None
+) -> tuple[QuerySet, int]:
+    """
+    Return 2-tuple of (queryset of the page's rows and one more row,
+    page size), see paginate.
+
+    :param queryset: Queryset returning dictionaries
+    :param params: Query string parameters
+    :param ordering: Field name, prefixed with "-" for descending order
+    :raises InvalidQueryError: If the parameters are not valid
+    """
+    limit = get_limit(params)
+    opts = queryset.model._meta
+    descending = bool(ordering) and ordering.startswith("-")
+    field = opts.get_field(ordering.lstrip("-")) if ordering else None
+
+    queryset = order_queryset(queryset, ordering)
+
+    cursor = params.get("after")
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        try:
+            if field:
+                value, pk = values
+                if value is not None:
+                    value = field.to_python(value)
+            else:
+                (pk,) = values
+            pk = opts.pk.to_python(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidQueryError(f"Invalid cursor: {cursor}")
+
+        if field:
+            queryset = queryset.filter(
+                get_keyset_filter(field, descending, value, pk)
+            )
+        else:
+            queryset = queryset.filter(pk__gt=pk)
+
+    # Fetch one extra row to find out whether there is a next page
+    return queryset[: limit + 1], limit
+
+
+def get_page(
+    results: list, limit: int, model, ordering: Optional[str] = None
+) -> dict:
+    """
+    Return page of the rows loaded by get_page_queryset
+    with the "next" cursor.
+
+    :param results: Loaded rows
+    :param limit: Page size
+    :param model: Model class of the rows
+    :param ordering: Field name, prefixed with "-" for descending order
+    """
+    opts = model._meta
+    field = opts.get_field(ordering.lstrip("-")) if ordering else None
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(
+            [last[field.attname], last[opts.pk.attname]] if field
+            else [last[opts.pk.attname]]
+        )
+
+    return {"results": results, "next": next_cursor}
@@ -0,0 +1,120 @@
+"""
+Incremental parsers for import payloads.
+
+Both parsers read the payload from a file-like object in chunks and yield
+one ``{"Model": {...}}`` item at a time, so memory usage doesn't depend
+on the size of the payload.
+"""
+import codecs
+import json
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+CHUNK_SIZE = 64 * 1024
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(stream, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield items of a top-level JSON array read from a stream.
+
+    :param stream: File-like object returning bytes
+    :param chunk_size: Number of bytes read at once
+    :raises json.JSONDecodeError: If the payload is not a valid JSON array
+        or a single item is larger than DATA_UPLOAD_MAX_MEMORY_SIZE
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    max_item_size: Optional[int] = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read() -> bool:
+        """
+        Append the next chunk to the buffer, dropping the consumed part.
+        Return False if the stream is exhausted.
+        """
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return not eof
+
+    def next_char() -> str:
+        """
+        Skip whitespace and return the next character, or "" at the end.
+        """
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read():
+                return ""
+
+    if next_char() != "[":
+        raise json.JSONDecodeError("Expecting '['", buffer, pos)
+    pos += 1
+
+    first = True
+    while True:
+        char = next_char()
+        if char == "]":
+            pos += 1
+            break
+        if not first:
+            if char != ",":
+                raise json.JSONDecodeError(
+                    "Expecting ',' delimiter", buffer, pos
+                )
+            pos += 1
+            next_char()
+
+        while True:
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                too_large = (
+                    max_item_size is not None
+                    and len(buffer) - pos > max_item_size
+                )
+                if too_large or not read():
+                    raise
+        first = False
+        yield item
+
+    if next_char():
+        raise json.JSONDecodeError("Extra data", buffer, pos)
+
+
+def iter_ndjson(stream) -> Iterator:
+    """
+    Yield items of a newline delimited JSON stream, one item per line.
+
+    :param stream: File-like object returning lines of bytes when iterated
+    :raises json.JSONDecodeError: If a line is not valid JSON
+    """
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_items(stream, content_type: str) -> Iterator:
+    """
+    Return an iterator over import items of a payload,
+    choosing the parser by its content type.
+
+    :param stream: HttpRequest with unread body or another binary file
+    :param content_type: Content type of the payload
+    """
+    if content_type in NDJSON_CONTENT_TYPES:
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
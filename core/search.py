@@ -0,0 +1,207 @@
+"""
+Ranked full-text search of products.
+
+On PostgreSQL, core_product has a generated ``search_vector`` tsvector
+column (name weighted above description) with a GIN index. On SQLite,
+the FTS5 table core_product_fts indexes the same columns and is kept in
+sync by triggers. Both are updated by the database on every write, so
+imports keep the index current and queries never rebuild it. Other
+databases fall back to unranked substring matching.
+
+Migrations which remake core_product on SQLite (Django does so for some
+schema changes) drop its triggers and must call create_sqlite_index
+again.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+from core.models import Catalog, Product
+
+WORD_RE = re.compile(r"\w+")
+
+# Text search configuration, "simple" doesn't depend on the language
+POSTGRES_CONFIG = "simple"
+
+POSTGRES_INDEX_SQL = [
+    f"""
+    ALTER TABLE core_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce(name, '')), 'A')
+        || setweight(
+            to_tsvector('{POSTGRES_CONFIG}', coalesce(description, '')), 'B'
+        )
+    ) STORED
+    """,
+    "CREATE INDEX core_product_search_vector ON core_product "
+    "USING gin (search_vector)",
+]
+
+POSTGRES_DROP_SQL = [
+    "ALTER TABLE core_product DROP COLUMN search_vector",
+]
+
+SQLITE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_product_fts USING fts5(
+        name, description, content='core_product', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_product_fts_insert
+    AFTER INSERT ON core_product BEGIN
+        INSERT INTO core_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_product_fts_delete
+    AFTER DELETE ON core_product BEGIN
+        INSERT INTO core_product_fts(
+            core_product_fts, rowid, name, description
+        ) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_product_fts_update
+    AFTER UPDATE ON core_product BEGIN
+        INSERT INTO core_product_fts(
+            core_product_fts, rowid, name, description
+        ) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO core_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO core_product_fts(core_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_product_fts_insert",
+    "DROP TRIGGER IF EXISTS core_product_fts_delete",
+    "DROP TRIGGER IF EXISTS core_product_fts_update",
+    "DROP TABLE IF EXISTS core_product_fts",
+]
+
+
+def create_sqlite_index(schema_editor) -> None:
+    """
+    Create the FTS5 table with its triggers and index existing products.
+
+    :param schema_editor: Schema editor of a migration
+    """
+    for sql in SQLITE_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor) -> None:
+    """
+    Migration operation creating the search index of the database.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_INDEX_SQL:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        create_sqlite_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor) -> None:
+    """
+    Migration operation dropping the search index of the database.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_DROP_SQL:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        for sql in SQLITE_DROP_SQL:
+            schema_editor.execute(sql)
+
+
+def get_words(query: str) -> list[str]:
+    """
+    Split a search query into words, dropping operators and punctuation,
+    so that user input can't break the query syntax.
+
+    :param query: Search query
+    """
+    return WORD_RE.findall(query)
+
+
+def search_products(query: str, queryset: QuerySet = None) -> QuerySet:
+    """
+    Return products containing all words of the query (or words
+    starting with them), annotated with ``rank`` and ordered
+    by it, best matches first.
+
+    :param query: Search query
+    :param queryset: Products to search, all products by default
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    words = get_words(query)
+    if not words:
+        return queryset.none()
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"{word}:*" for word in words)
+        match = f"to_tsquery('{POSTGRES_CONFIG}', %s)"
+        queryset = queryset.annotate(
+            rank=RawSQL(
+                f"ts_rank(core_product.search_vector, {match})",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        ).filter(
+            pk__in=RawSQL(
+                f"SELECT id FROM core_product "
+                f"WHERE search_vector @@ {match}",
+                [tsquery],
+            )
+        )
+    elif vendor == "sqlite":
+        fts_query = " AND ".join(f'"{word}"*' for word in words)
+        # bm25 is lower for better matches
+        queryset = queryset.annotate(
+            rank=RawSQL(
+                "SELECT -bm25(core_product_fts, 10.0, 1.0) "
+                "FROM core_product_fts WHERE core_product_fts MATCH %s "
+                "AND rowid = core_product.id",
+                [fts_query],
+                output_field=FloatField(),
+            )
+        ).filter(
+            pk__in=RawSQL(
+                "SELECT rowid FROM core_product_fts "
+                "WHERE core_product_fts MATCH %s",
+                [fts_query],
+            )
+        )
+    else:
+        condition = Q()
+        for word in words:
+            condition &= Q(name__icontains=word) | Q(
+                description__icontains=word
+            )
+        queryset = queryset.filter(condition).annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.order_by(F("rank").desc(), "pk")
+
+
+def filter_catalog(queryset: QuerySet, catalog_id: int) -> QuerySet:
+    """
+    Return products of the queryset which are in the catalog.
+
+    :param queryset: Products
+    :param catalog_id: ID of the catalog
+    """
+    return queryset.filter(
+        pk__in=Catalog.products.through.objects.filter(
+            catalog_id=catalog_id
+        ).values("product_id")
+    )
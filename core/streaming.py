@@ -0,0 +1,152 @@
+"""
+Streaming JSON responses for listings of whole tables.
+
+Rows are read from the database with a server-side cursor where supported
+and encoded in chunks, so neither the queryset nor the encoded response
+has to fit in memory.
+
+Async views stream rows from an async iterator with
+AsyncStreamingHttpResponse, which core.asgi.ASGIHandler sends without
+blocking a worker thread.
+"""
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from core.utils import aiter_chunks, iter_chunks
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+encoder = DjangoJSONEncoder()
+
+
+def iter_json_array(rows: Iterable) -> Iterator[str]:
+    """
+    Encode rows as a JSON array, one chunk of rows at a time.
+
+    :param rows: Iterable of JSON serializable rows
+    """
+    yield "["
+    separator = ""
+    for chunk in iter_chunks(rows, settings.LIST_STREAM_CHUNK_SIZE):
+        yield separator + ", ".join(encoder.encode(row) for row in chunk)
+        separator = ", "
+    yield "]"
+
+
+def iter_ndjson(rows: Iterable) -> Iterator[str]:
+    """
+    Encode rows as newline delimited JSON, one chunk of rows at a time.
+
+    :param rows: Iterable of JSON serializable rows
+    """
+    for chunk in iter_chunks(rows, settings.LIST_STREAM_CHUNK_SIZE):
+        yield "".join(encoder.encode(row) + "\n" for row in chunk)
+
+
+async def aiter_json_array(rows: AsyncIterable) -> AsyncIterator[str]:
+    """
+    Async version of iter_json_array.
+
+    :param rows: Async iterable of JSON serializable rows
+    """
+    yield "["
+    separator = ""
+    async for chunk in aiter_chunks(rows, settings.LIST_STREAM_CHUNK_SIZE):
+        yield separator + ", ".join(encoder.encode(row) for row in chunk)
+        separator = ", "
+    yield "]"
+
+
+async def aiter_ndjson(rows: AsyncIterable) -> AsyncIterator[str]:
+    """
+    Async version of iter_ndjson.
+
+    :param rows: Async iterable of JSON serializable rows
+    """
+    async for chunk in aiter_chunks(rows, settings.LIST_STREAM_CHUNK_SIZE):
+        yield "".join(encoder.encode(row) + "\n" for row in chunk)
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Streaming response with content produced by an async iterator.
+
+    core.asgi.ASGIHandler sends it with ``async for``. Django 4.1 itself
+    only iterates streaming responses synchronously, which is supported
+    too (e.g. under WSGI), reading the whole content at once.
+
+    :param content: Async iterable of strings or bytes
+    """
+
+    is_async = True
+
+    def __init__(self, content: AsyncIterable, *args, **kwargs):
+        self.async_content = content
+        super().__init__(self.iter_sync(), *args, **kwargs)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for part in self.async_content:
+            yield self.make_bytes(part)
+
+    def iter_sync(self) -> Iterator:
+        """
+        Yield parts of the async content from synchronous code.
+        The content is read at once, like Django 4.2 does, because every
+        async_to_sync call runs its own event loop, which closes async
+        generators started in it when it ends.
+        """
+
+        async def read() -> list:
+            return [part async for part in self.async_content]
+
+        yield from async_to_sync(read)()
+
+
+def wants_ndjson(request) -> bool:
+    """
+    Whether the client asked for newline delimited JSON with
+    ``?format=ndjson`` or the Accept header.
+
+    :param request: HttpRequest
+    """
+    return (
+        request.GET.get("format") == "ndjson"
+        or NDJSON_CONTENT_TYPE in request.headers.get("Accept", "")
+    )
+
+
+def stream_rows(request, rows: Iterable) -> StreamingHttpResponse:
+    """
+    Return a streaming response with rows encoded as a JSON array,
+    or as newline delimited JSON if the client asked for it.
+
+    :param request: HttpRequest
+    :param rows: Iterable of JSON serializable rows
+    """
+    if wants_ndjson(request):
+        return StreamingHttpResponse(
+            iter_ndjson(rows), content_type=NDJSON_CONTENT_TYPE
+        )
+    return StreamingHttpResponse(
+        iter_json_array(rows), content_type="application/json"
+    )
+
+
+def astream_rows(request, rows: AsyncIterable) -> AsyncStreamingHttpResponse:
+    """
+    Async version of stream_rows.
+
+    :param request: HttpRequest
+    :param rows: Async iterable of JSON serializable rows
+    """
+    if wants_ndjson(request):
+        return AsyncStreamingHttpResponse(
+            aiter_ndjson(rows), content_type=NDJSON_CONTENT_TYPE
+        )
+    return AsyncStreamingHttpResponse(
+        aiter_json_array(rows), content_type="application/json"
+    )
@@ -1,11 +1,40 @@
+import io
 import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-from django.test import RequestFactory, TestCase, Client
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldError, ValidationError
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, RequestFactory, \
+    SimpleTestCase, TestCase, TransactionTestCase, Client, \
+    override_settings
 from django.urls import reverse
+from django.utils import timezone
 
+from core import facets
+from core.asgi import ASGIHandler
+from core.importer import ATOMIC_PAYLOAD, Importer, ImportDataError, \
+    sync_many_to_many
+from core.jobs import run_import_job
+from core.metrics import MetricsMiddleware, metrics
+from core.management.commands.bench import find_regressions, \
+    measure_requests, run_benchmark
+from core.parsers import iter_json_array, iter_ndjson
 from core.models import AttributeName, AttributeValue, Product, Attribute, \
-    Catalog
-from core.views import ModelListView, ObjectDetailView
+    Catalog, CatalogDocument, ProductAttribute, Image, ProductImage, \
+    ImportJob, ModelVersion
+from core.serializers import get_serializer
+from core.streaming import AsyncStreamingHttpResponse, aiter_json_array
+from core.translation import get_translation_plan
+from core.versions import get_version_name
+from core.views import AsyncModelListView, AsyncObjectDetailView, \
+    ModelListView, ObjectDetailView
 
 
 class ImportObjectsViewTest(TestCase):
@@ -64,6 +93,37 @@ class ImportObjectsViewTest(TestCase):
         self.assertEqual(Attribute.objects.get(pk=1).name.pk, 1)
         self.assertEqual(Attribute.objects.get(pk=1).value.pk, 1)
 
+    def test_post_accepts_numeric_price(self):
+        data = [
+            {
+                "Product": {
+                    "id": 10,
+                    "nazev": "Product",
+                    "cena": 19.99,
+                    "mena": "CZK",
+                    "is_published": True,
+                }
+            },
+        ]
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(pk=10).price, Decimal("19.99"))
+
+    def test_post_reports_too_large_id(self):
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(
+                [{"Catalog": {"id": 1, "nazev": "x", "products_ids": [2**70]}}]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("products_ids", response.json()["error"])
+
     def test_post_correctly_creates_or_updates_objects(self):
         data = [
             {
@@ -169,6 +229,284 @@ class ImportObjectsViewTest(TestCase):
         )
         self.assertEqual(response.status_code, 400)
 
+    def test_post_imports_sample_data_in_batches(self):
+        with open(Path(settings.BASE_DIR) / "data.json") as f:
+            data = f.read()
+        response = self.client.post(
+            reverse("import_objects") + "?batch_size=5",
+            data=data,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "success")
+        self.assertEqual(response.json()["rows"]["Image"]["created"], 6)
+        self.assertEqual(Attribute.objects.count(), 27)
+        self.assertEqual(ProductAttribute.objects.count(), 17)
+        self.assertEqual(Image.objects.count(), 6)
+        self.assertEqual(ProductImage.objects.count(), 5)
+        self.assertEqual(Catalog.objects.get(pk=1).products.count(), 4)
+
+    def test_post_skips_unchanged_rows(self):
+        with open(Path(settings.BASE_DIR) / "data.json") as f:
+            data = json.load(f)
+        self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        versions = dict(ModelVersion.objects.values_list("model", "version"))
+        updated_on = Product.objects.get(pk=1).updated_on
+
+        data.append({"Product": {"id": 2, "cena": "1.00"}})
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        rows = response.json()["rows"]
+        self.assertEqual(rows["Product"]["updated"], 1)
+        self.assertEqual(rows["Product"]["created"], 0)
+        for model_name, counts in rows.items():
+            if model_name != "Product":
+                self.assertEqual(counts["created"] + counts["updated"], 0)
+        self.assertEqual(Product.objects.get(pk=1).updated_on, updated_on)
+        self.assertEqual(Product.objects.get(pk=2).price, Decimal("1.00"))
+        changed = [
+            model
+            for model, version in ModelVersion.objects.values_list(
+                "model", "version"
+            )
+            if version != versions.get(model)
+        ]
+        self.assertEqual(changed, [get_version_name(Product)])
+
+    def test_post_imports_objects_in_any_order(self):
+        with open(Path(settings.BASE_DIR) / "data.json") as f:
+            data = json.load(f)
+        # Keep the order of rows with the same model and ID,
+        # later rows of those override earlier ones.
+        data.sort(key=lambda obj: "Attribute" in obj or "Catalog" in obj)
+        data.reverse()
+        response = self.client.post(
+            reverse("import_objects") + "?batch_size=5",
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Attribute.objects.count(), 27)
+        self.assertEqual(ProductAttribute.objects.count(), 17)
+        self.assertEqual(ProductImage.objects.count(), 5)
+        self.assertEqual(Catalog.objects.get(pk=1).attributes.count(), 4)
+
+    def test_post_raises_error_on_missing_reference(self):
+        data = [{"Attribute": {"id": 3, "nazev_atributu_id": 99}}]
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["error"],
+            "Invalid data for Attribute: "
+            "Attribute name with ID 99 does not exist",
+        )
+
+    def test_importer_checks_references_with_one_query_per_model(self):
+        data = [
+            {"Attribute": {"id": i, "nazev_atributu_id": 1 + i % 2,
+                           "hodnota_atributu_id": 1 + i % 2}}
+            for i in range(1, 51)
+        ]
+        # Reference checks for AttributeName and AttributeValue,
+        # existing IDs, update of the two existing rows, insert,
+        # two queries bumping the model version, two queries looking up
+        # catalogs containing the attributes.
+        with self.assertNumQueries(9):
+            Importer().run(data)
+
+    def test_post_writes_nothing_if_any_row_is_invalid(self):
+        data = [
+            {"AttributeValue": {"id": 3, "hodnota": "žlutá"}},
+            {"Product": {"id": 4, "nazev": "x" * 126}},
+            {"Product": {"id": 5, "nazev": "Nový", "cena": "12.5"}},
+            {"ProductAttributes": {"id": 1, "product": 5, "attribute": 1}},
+            {"Product": {"id": 1, "cena": "123456789.99"}},
+            {"Product": {"id": 2, "mena": "CZKK"}},
+            {"Catalog": {"id": 1, "nazev": "Katalog", "products_ids": [9]}},
+        ]
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(
+            [error["index"] for error in errors], [1, 2, 3, 4, 5, 6]
+        )
+        self.assertEqual(
+            errors[1]["error"],
+            "Invalid data for Product: Missing fields of a new object: "
+            "is_published",
+        )
+        # Product 5 is not imported, so the row linking it is invalid too
+        self.assertEqual(
+            errors[2]["error"],
+            "Invalid data for ProductAttribute: "
+            "Product with ID 5 does not exist",
+        )
+        self.assertEqual(response.json()["error"], errors[0]["error"])
+        self.assertFalse(AttributeValue.objects.filter(pk=3).exists())
+
+    def test_post_dry_run_only_validates(self):
+        data = [{"AttributeValue": {"id": 3, "hodnota": "žlutá"}}]
+        response = self.client.post(
+            reverse("import_objects") + "?dry_run=1",
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"status": "valid"})
+        self.assertFalse(AttributeValue.objects.filter(pk=3).exists())
+
+        data.append({"Attribute": {"id": 3, "nazev_atributu_id": 99}})
+        response = self.client.post(
+            reverse("import_objects") + "?dry_run=1&transaction=payload",
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"],
+            [
+                {
+                    "index": 1,
+                    "model": "Attribute",
+                    "error": "Invalid data for Attribute: "
+                    "Attribute name with ID 99 does not exist",
+                }
+            ],
+        )
+        self.assertFalse(AttributeValue.objects.filter(pk=3).exists())
+
+    def test_validation_queries_each_model_once(self):
+        data = [
+            {"Attribute": {"id": i, "nazev_atributu_id": 1 + i % 3,
+                           "hodnota_atributu_id": 1 + i % 2}}
+            for i in range(1, 51)
+        ]
+        importer = Importer(batch_size=20)
+        # Existing IDs of Attribute (in three chunks), AttributeName
+        # and AttributeValue
+        with self.assertNumQueries(5):
+            importer.validate(data)
+        # Rows referencing the missing attribute name 3
+        self.assertEqual(importer.invalid, set(range(1, 50, 3)))
+        self.assertEqual(AttributeName.objects.count(), 2)
+
+    def test_post_only_updates_fields_present_in_row(self):
+        data = [{"AttributeName": {"id": 1, "nazev": "Barva"}}]
+        response = self.client.post(
+            reverse("import_objects"),
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        obj = AttributeName.objects.get(pk=1)
+        self.assertEqual(obj.name, "Barva")
+        self.assertEqual(obj.code, "attributename1")
+
+    def test_post_raises_error_on_invalid_batch_size(self):
+        # "²" is a digit, but not a decimal which int() accepts
+        for batch_size in ["0", "x", "\u00b2"]:
+            with self.subTest(batch_size=batch_size):
+                response = self.client.post(
+                    reverse("import_objects") + f"?batch_size={batch_size}",
+                    data="[]",
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_importer_counts_created_and_updated_rows(self):
+        importer = Importer(batch_size=2)
+        importer.run(
+            [
+                {"AttributeValue": {"id": 1, "hodnota": "modrá"}},
+                {"AttributeValue": {"id": 3, "hodnota": "žlutá"}},
+                {"AttributeValue": {"id": 4, "hodnota": "růžová"}},
+            ]
+        )
+        self.assertEqual(importer.created, {"AttributeValue": 2})
+        self.assertEqual(importer.updated, {"AttributeValue": 1})
+        self.assertEqual(AttributeValue.objects.get(pk=1).value, "modrá")
+
+    def test_post_handles_ndjson_data_correctly(self):
+        data = "\n".join(
+            json.dumps(obj)
+            for obj in [
+                {"AttributeValue": {"id": 3, "hodnota": "žlutá"}},
+                {"Attribute": {"id": 3, "nazev_atributu_id": 2,
+                               "hodnota_atributu_id": 3}},
+            ]
+        )
+        response = self.client.post(
+            reverse("import_objects"),
+            data=data,
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Attribute.objects.get(pk=3).value.value, "žlutá")
+
+    def test_post_raises_error_on_invalid_json(self):
+        response = self.client.post(
+            reverse("import_objects"),
+            data='[{"AttributeValue": {"id": 3, "hodnota": "žlutá"}',
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"status": "error", "error": "Invalid JSON"}
+        )
+
+    def test_post_atomic_import_reports_all_invalid_rows(self):
+        data = [
+            {"AttributeValue": {"id": 3, "hodnota": "žlutá"}},
+            {"invalid_model_name": {"id": 1}},
+            {"Attribute": {"id": 3, "nazev_atributu_id": 99}},
+            {"Attribute": {"id": 4, "nazev_atributu_id": 1}},
+            {"AttributeName": {"id": 1, "zobrazit": "Invalid"}},
+        ]
+        for mode in ["payload", "chunk"]:
+            with self.subTest(mode=mode):
+                response = self.client.post(
+                    reverse("import_objects")
+                    + f"?transaction={mode}&batch_size=2",
+                    data=json.dumps(data),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+                errors = response.json()["errors"]
+                self.assertEqual(
+                    [(e["index"], e["model"]) for e in errors],
+                    [
+                        (1, "invalid_model_name"),
+                        (2, "Attribute"),
+                        (4, "AttributeName"),
+                    ],
+                )
+                self.assertTrue(AttributeValue.objects.filter(pk=3).exists())
+                self.assertTrue(Attribute.objects.filter(pk=4).exists())
+                self.assertFalse(Attribute.objects.filter(pk=3).exists())
+                self.assertTrue(AttributeName.objects.get(pk=1).display)
+
+    def test_post_raises_error_on_invalid_transaction_mode(self):
+        response = self.client.post(
+            reverse("import_objects") + "?transaction=invalid",
+            data="[]",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_post_raises_error_on_invalid_model_name(self):
         data = [{"invalid_model_name": {"id": 1, "name": "Test Object"}}]
         response = self.client.post(
@@ -179,8 +517,162 @@ class ImportObjectsViewTest(TestCase):
         self.assertEqual(response.status_code, 400)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobViewTest(TestCase):
+    def post_async(self, data):
+        return self.client.post(
+            reverse("import_objects") + "?async=1",
+            data=json.dumps(data),
+            content_type="application/json",
+        )
+
+    def test_post_async_returns_job(self):
+        response = self.post_async([{"Image": {"id": 1, "obrazek": "a"}}])
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job"]
+        self.assertEqual(ImportJob.objects.get(pk=job_id).status, "pending")
+        self.assertEqual(Image.objects.count(), 0)
+
+        response = self.client.get(response.json()["url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "pending")
+
+    def test_job_reports_progress(self):
+        response = self.post_async(
+            [
+                {"Image": {"id": 1, "obrazek": "https://example.com/1.jpg"}},
+                {"Image": {"id": 2, "obrazek": "https://example.com/2.jpg"}},
+            ]
+        )
+        job_id = response.json()["job"]
+        run_import_job(job_id)
+
+        data = self.client.get(reverse("import_job", args=[job_id])).json()
+        self.assertEqual(data["status"], "success")
+        self.assertEqual(data["processed"], {"Image": 2})
+        self.assertEqual(data["rows"], 2)
+        self.assertIsNone(data["error"])
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_job_reports_first_error(self):
+        response = self.post_async([{"invalid_model": {"id": 1}}])
+        job_id = response.json()["job"]
+        run_import_job(job_id)
+
+        data = self.client.get(reverse("import_job", args=[job_id])).json()
+        self.assertEqual(data["status"], "error")
+        self.assertEqual(data["error"], "Invalid model name: invalid_model")
+
+    def test_get_invalid_job(self):
+        response = self.client.get(
+            reverse(
+                "import_job", args=["00000000-0000-0000-0000-000000000000"]
+            )
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TranslationTestCase(SimpleTestCase):
+    def test_translate_row(self):
+        plan = get_translation_plan("Product")
+        row = {"id": "1", "nazev": "Product", "cena": "10.5",
+               "is_published": "true", "published_on": "2023-01-01 10:00"}
+        data = plan.translate(row)
+        self.assertEqual(
+            data,
+            {
+                "id": 1,
+                "name": "Product",
+                "price": Decimal("10.5"),
+                "is_published": True,
+                "published_on": datetime(
+                    2023, 1, 1, 10, tzinfo=dt_timezone.utc
+                ),
+            },
+        )
+        # The imported row is not changed
+        self.assertIn("nazev", row)
+
+    def test_plan_is_built_once_per_source_name(self):
+        plan = get_translation_plan("ProductAttributes")
+        self.assertIs(plan.model, ProductAttribute)
+        self.assertIs(get_translation_plan("ProductAttributes"), plan)
+        self.assertEqual(
+            plan.translate({"id": 1, "product": 2, "attribute": 3}),
+            {"id": 1, "product_id": 2, "attribute_id": 3},
+        )
+
+    def test_unknown_model(self):
+        self.assertIsNone(get_translation_plan("ImportJob"))
+        self.assertIsNone(get_translation_plan("Invalid"))
+
+    def test_unknown_keys_are_rejected(self):
+        # Foreign keys are imported by attname, updated_on is not editable
+        for key in ["invalid", "name", "updated_on", "products_ids"]:
+            with self.subTest(key=key):
+                with self.assertRaisesMessage(
+                    FieldError, f"Invalid field name: {key}"
+                ):
+                    get_translation_plan("Attribute").translate(
+                        {"id": 1, key: 1}
+                    )
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValidationError):
+            get_translation_plan("Product").translate({"cena": "abc"})
+
+    def test_values_are_checked_against_fields(self):
+        plan = get_translation_plan("Product")
+        for row, message in [
+            ({"nazev": "x" * 126}, "nazev: Ensure this value has at most"),
+            ({"cena": "123456789.99"}, "cena: Ensure that there are no more"),
+            ({"cena": "1.999"}, "cena: Ensure that there are no more"),
+            ({"mena": "CZKK"}, "mena: Ensure this value has at most 3"),
+            ({"mena": None}, "mena: This field cannot be null"),
+        ]:
+            with self.subTest(row=row):
+                with self.assertRaisesMessage(ValidationError, message):
+                    plan.translate(row)
+
+    def test_ids_are_checked_against_column_range(self):
+        message = "Ensure this value is less than or equal to"
+        for source_name, row in [
+            ("Product", {"id": 2**70}),
+            ("ProductAttributes", {"attribute": 2**70}),
+            ("Catalog", {"products_ids": [1, 2**70]}),
+            ("Catalog", {"id": -(2**70)}),
+        ]:
+            with self.subTest(row=row):
+                with self.assertRaises(ValidationError):
+                    get_translation_plan(source_name).translate(row)
+        with self.assertRaisesMessage(ValidationError, message):
+            get_translation_plan("Product").translate({"id": 2**70})
+
+
+class ParsersTestCase(SimpleTestCase):
+    def test_iter_json_array_matches_json_loads(self):
+        with open(Path(settings.BASE_DIR) / "data.json", "rb") as f:
+            data = f.read()
+        items = list(iter_json_array(io.BytesIO(data), chunk_size=7))
+        self.assertEqual(items, json.loads(data))
+
+    def test_iter_json_array_rejects_invalid_payloads(self):
+        for data in [b"", b"{}", b"[1,]", b"[1 2]", b"[1] 2", b"[{}"]:
+            with self.subTest(data=data):
+                with self.assertRaises(json.JSONDecodeError):
+                    list(iter_json_array(io.BytesIO(data), chunk_size=2))
+
+    def test_iter_ndjson_skips_blank_lines(self):
+        data = b'{"Image": {"id": 1}}\n\n{"Image": {"id": 2}}\n'
+        self.assertEqual(
+            list(iter_ndjson(io.BytesIO(data))),
+            [{"Image": {"id": 1}}, {"Image": {"id": 2}}],
+        )
+
+
 class ModelListViewTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.factory = RequestFactory()
         self.valid_model_name = "AttributeName"
         self.invalid_model_name = "invalid_model"
@@ -191,7 +683,174 @@ class ModelListViewTestCase(TestCase):
         response = view(request, model_name=self.valid_model_name)
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.content)
-        self.assertEqual(data, [])  # assuming 'valid_model' has no instances
+        # assuming 'valid_model' has no instances
+        self.assertEqual(data, {"results": [], "next": None})
+
+    def test_get_all_without_pagination(self):
+        request = self.factory.get("/", {"all": "1"})
+        view = ModelListView.as_view()
+        response = view(request, model_name=self.valid_model_name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_get_pages_by_cursor(self):
+        for i in range(5):
+            AttributeValue.objects.create(value=f"Value {i}")
+
+        view = ModelListView.as_view()
+        values, after = [], None
+        for _ in range(3):
+            params = {"limit": 2, **({"after": after} if after else {})}
+            response = view(
+                self.factory.get("/", params), model_name="attributevalue"
+            )
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            values += [obj["value"] for obj in data["results"]]
+            after = data["next"]
+
+        self.assertIsNone(after)
+        self.assertEqual(values, [f"Value {i}" for i in range(5)])
+
+    def test_get_stream(self):
+        for i in range(3):
+            AttributeValue.objects.create(value=f"Value {i}")
+
+        view = ModelListView.as_view()
+        response = view(
+            self.factory.get("/", {"stream": "1"}),
+            model_name="attributevalue",
+        )
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [obj["value"] for obj in data], [f"Value {i}" for i in range(3)]
+        )
+
+        response = view(
+            self.factory.get("/", {"stream": "1", "format": "ndjson"}),
+            model_name="attributevalue",
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(
+            [json.loads(line)["value"] for line in lines],
+            [f"Value {i}" for i in range(3)],
+        )
+
+    def test_get_stream_of_empty_table(self):
+        response = ModelListView.as_view()(
+            self.factory.get("/", {"stream": "1"}),
+            model_name=self.valid_model_name,
+        )
+        self.assertEqual(b"".join(response.streaming_content), b"[]")
+
+    def test_get_selected_fields(self):
+        AttributeName.objects.create(name="Barva", code="color")
+        request = self.factory.get("/", {"fields": "name", "all": "1"})
+        response = ModelListView.as_view()(
+            request, model_name=self.valid_model_name
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(list(data[0]), ["id", "name"])
+
+    def test_get_invalid_field(self):
+        request = self.factory.get("/", {"fields": "name,invalid"})
+        response = ModelListView.as_view()(
+            request, model_name=self.valid_model_name
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            json.loads(response.content)["error"],
+            "Invalid field name: invalid",
+        )
+
+    def create_products(self):
+        for i, (price, currency, published_on) in enumerate(
+            [
+                (300, "CZK", "2023-01-03T00:00:00Z"),
+                (100, "EUR", None),
+                (200, "CZK", "2023-01-01T00:00:00Z"),
+                (200, "CZK", None),
+                (500, "USD", "2023-01-02T00:00:00Z"),
+            ]
+        ):
+            Product.objects.create(
+                name=f"Product {i}",
+                price=price,
+                currency=currency,
+                published_on=published_on,
+                is_published=published_on is not None,
+            )
+
+    def get_all_pages(self, params):
+        view = ModelListView.as_view()
+        names, after = [], None
+        while True:
+            cursor = {"after": after} if after else {}
+            request = self.factory.get("/", {"limit": 2, **params, **cursor})
+            response = view(request, model_name="product")
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            names += [obj["name"] for obj in data["results"]]
+            after = data["next"]
+            if not after:
+                return names
+
+    def test_get_filtered(self):
+        self.create_products()
+        self.assertEqual(
+            self.get_all_pages({"currency": "CZK", "price_min": "200"}),
+            ["Product 0", "Product 2", "Product 3"],
+        )
+        self.assertEqual(
+            self.get_all_pages(
+                {"is_published": "true", "published_after": "2023-01-02"}
+            ),
+            ["Product 0", "Product 4"],
+        )
+
+    def test_get_ordered(self):
+        self.create_products()
+        self.assertEqual(
+            self.get_all_pages({"ordering": "price", "fields": "name"}),
+            ["Product 1", "Product 2", "Product 3", "Product 0", "Product 4"],
+        )
+        self.assertEqual(
+            self.get_all_pages({"ordering": "-price"}),
+            ["Product 4", "Product 0", "Product 3", "Product 2", "Product 1"],
+        )
+        self.assertEqual(
+            self.get_all_pages({"ordering": "published_on"}),
+            ["Product 2", "Product 4", "Product 0", "Product 1", "Product 3"],
+        )
+        self.assertEqual(
+            self.get_all_pages({"ordering": "-published_on"}),
+            ["Product 0", "Product 4", "Product 2", "Product 3", "Product 1"],
+        )
+
+    def test_get_invalid_filter_or_ordering(self):
+        view = ModelListView.as_view()
+        for params in [{"price_min": "x"}, {"is_published": "maybe"},
+                       {"ordering": "description"}]:
+            with self.subTest(params=params):
+                response = view(
+                    self.factory.get("/", params), model_name="product"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_get_invalid_page_parameters(self):
+        view = ModelListView.as_view()
+        for params in [{"limit": "0"}, {"limit": "x"}, {"limit": "\u00b2"},
+                       {"after": "e30"}, {"after": "!"},
+                       {"after": "WyJ4Il0"}]:
+            with self.subTest(params=params):
+                response = view(
+                    self.factory.get("/", params),
+                    model_name=self.valid_model_name,
+                )
+                self.assertEqual(response.status_code, 400)
 
     def test_get_invalid_model(self):
         request = self.factory.get("/")
@@ -208,8 +867,117 @@ class ModelListViewTestCase(TestCase):
         )
 
 
+class ExpandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = [
+            AttributeName.objects.create(name=f"Name {i}", code=f"name{i}")
+            for i in range(3)
+        ]
+        values = [
+            AttributeValue.objects.create(value=f"Value {i}") for i in range(3)
+        ]
+        attributes = [
+            Attribute.objects.create(name=name, value=value)
+            for name, value in zip(names, values)
+        ]
+        image = Image.objects.create(url="https://example.com/image.jpg")
+        for i in range(5):
+            product = Product.objects.create(
+                name=f"Product {i}", price=100, currency="CZK",
+                is_published=True,
+            )
+            for attribute in attributes[: i % 3 + 1]:
+                ProductAttribute.objects.create(
+                    product=product, attribute=attribute
+                )
+            ProductImage.objects.create(
+                product=product, image=image, name="photo"
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_detail_expands_related_objects(self):
+        product = Product.objects.get(name="Product 2")
+        request = self.factory.get(
+            "/", {"expand": "attributes.name,attributes.value,images"}
+        )
+        # updated_on, versions, product, attributes with names and values,
+        # images
+        with self.assertNumQueries(5):
+            response = ObjectDetailView.as_view()(
+                request, model_name="product", pk=product.pk
+            )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [
+                (attribute["name"]["name"], attribute["value"]["value"])
+                for attribute in data["attributes"]
+            ],
+            [("Name 0", "Value 0"), ("Name 1", "Value 1"),
+             ("Name 2", "Value 2")],
+        )
+        self.assertEqual(
+            data["images"][0]["url"], "https://example.com/image.jpg"
+        )
+
+    def test_detail_expands_foreign_key(self):
+        attribute = Attribute.objects.first()
+        request = self.factory.get("/", {"expand": "name"})
+        with self.assertNumQueries(3):
+            response = ObjectDetailView.as_view()(
+                request, model_name="attribute", pk=attribute.pk
+            )
+        data = json.loads(response.content)
+        self.assertEqual(data["name"]["code"], "name0")
+        self.assertEqual(data["value"], attribute.value_id)
+
+    def test_list_query_count_does_not_grow_with_results(self):
+        view = ModelListView.as_view()
+        for limit in [2, 5]:
+            request = self.factory.get(
+                "/",
+                {
+                    "limit": limit,
+                    "expand": "attributes.name,attributes.value,images",
+                },
+            )
+            # versions, page, objects to expand, attributes, images
+            with self.assertNumQueries(5):
+                response = view(request, model_name="product")
+            data = json.loads(response.content)
+            self.assertEqual(len(data["results"]), limit)
+            self.assertEqual(
+                [len(obj["attributes"]) for obj in data["results"]],
+                [1, 2, 3, 1, 2][:limit],
+            )
+
+    def test_stream_expands_related_objects(self):
+        request = self.factory.get("/", {"stream": "1", "expand": "product"})
+        response = ModelListView.as_view()(request, model_name="productimage")
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [obj["product"]["name"] for obj in data],
+            [f"Product {i}" for i in range(5)],
+        )
+
+    def test_invalid_expand(self):
+        for expand in ["invalid", "name", "attributes.invalid",
+                       "productattribute"]:
+            with self.subTest(expand=expand):
+                request = self.factory.get("/", {"expand": expand})
+                response = ModelListView.as_view()(
+                    request, model_name="product"
+                )
+                self.assertEqual(response.status_code, 400)
+
+
 class ObjectDetailViewTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.factory = RequestFactory()
         self.valid_model_name = "AttributeName"
         self.invalid_model_name = "invalid_model"
@@ -230,34 +998,1000 @@ class ObjectDetailViewTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
-    def test_get_invalid_model(self):
-        request = self.factory.get("/")
+    def test_get_selected_fields(self):
+        request = self.factory.get("/", {"fields": "name,display"})
         view = ObjectDetailView.as_view()
         response = view(
-            request, model_name=self.invalid_model_name, pk=self.valid_pk
+            request, model_name=self.valid_model_name, pk=self.valid_pk
         )
-        self.assertEqual(response.status_code, 400)
-        data = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
         self.assertEqual(
-            data,
-            {
-                "status": "error",
-                "error": f"Invalid model name: {self.invalid_model_name}",
-            },
+            json.loads(response.content),
+            {"id": 1, "name": "Attribute Name 1", "display": True},
         )
 
-    def test_get_invalid_object(self):
-        request = self.factory.get("/")
+    def test_get_selected_fields_skips_many_to_many(self):
+        product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+        request = self.factory.get("/", {"fields": "name,price"})
         view = ObjectDetailView.as_view()
-        response = view(
-            request, model_name=self.valid_model_name, pk=self.invalid_pk
+        with self.assertNumQueries(2):
+            response = view(request, model_name="product", pk=product.pk)
+        self.assertEqual(
+            json.loads(response.content),
+            {"id": product.pk, "name": "Product", "price": "100.00"},
         )
-        self.assertEqual(response.status_code, 404)
-        data = json.loads(response.content)
+
+    def test_get_through_model(self):
+        product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+        catalog = Catalog.objects.create(name="Catalog")
+        catalog.products.add(product)
+        link = Catalog.products.through.objects.get()
+        response = ObjectDetailView.as_view()(
+            self.factory.get("/"), model_name="catalog_products", pk=link.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {"id": link.pk, "catalog": catalog.pk, "product": product.pk},
+        )
+
+    def test_get_invalid_field(self):
+        request = self.factory.get("/", {"fields": "invalid"})
+        view = ObjectDetailView.as_view()
+        response = view(
+            request, model_name=self.valid_model_name, pk=self.valid_pk
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_invalid_model(self):
+        request = self.factory.get("/")
+        view = ObjectDetailView.as_view()
+        response = view(
+            request, model_name=self.invalid_model_name, pk=self.valid_pk
+        )
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.content)
         self.assertEqual(
             data,
             {
                 "status": "error",
-                "error": f"Attribute name with ID {self.invalid_pk} does not exist",
+                "error": f"Invalid model name: {self.invalid_model_name}",
+            },
+        )
+
+    def test_get_invalid_object(self):
+        request = self.factory.get("/")
+        view = ObjectDetailView.as_view()
+        response = view(
+            request, model_name=self.valid_model_name, pk=self.invalid_pk
+        )
+        self.assertEqual(response.status_code, 404)
+        data = json.loads(response.content)
+        self.assertEqual(
+            data,
+            {
+                "status": "error",
+                "error": f"Attribute name with ID {self.invalid_pk} "
+                "does not exist",
+            },
+        )
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+
+    def test_repeated_request_is_cached(self):
+        view = ModelListView.as_view()
+        response = view(self.factory.get("/"), model_name="product")
+        # Only the versions are loaded
+        with self.assertNumQueries(1):
+            cached = view(self.factory.get("/"), model_name="product")
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.content, response.content)
+
+    def test_import_invalidates_cached_response(self):
+        view = ObjectDetailView.as_view()
+        view(self.factory.get("/"), model_name="product", pk=self.product.pk)
+        Importer().run([{"Product": {"id": self.product.pk, "nazev": "New"}}])
+        response = view(
+            self.factory.get("/"), model_name="product", pk=self.product.pk
+        )
+        self.assertEqual(json.loads(response.content)["name"], "New")
+
+    def test_expanded_model_change_invalidates_cached_response(self):
+        image = Image.objects.create(name="Image", url="https://a.com/1.jpg")
+        ProductImage.objects.create(
+            product=self.product, image=image, name="photo"
+        )
+        request = self.factory.get("/", {"expand": "images"})
+        view = ObjectDetailView.as_view()
+        view(request, model_name="product", pk=self.product.pk)
+        Image.objects.filter(pk=image.pk).update(url="https://a.com/2.jpg")
+        Importer().run([{"Image": {"id": image.pk, "nazev": "New image"}}])
+        response = view(request, model_name="product", pk=self.product.pk)
+        self.assertEqual(
+            json.loads(response.content)["images"][0]["name"], "New image"
+        )
+
+    def test_error_response_is_not_cached(self):
+        view = ObjectDetailView.as_view()
+        response = view(self.factory.get("/"), model_name="product", pk=999)
+        self.assertEqual(response.status_code, 404)
+        # bulk_create sends no signals, so the version stays the same
+        Product.objects.bulk_create(
+            [Product(pk=999, name="Later", price=1, currency="CZK",
+                     is_published=True)]
+        )
+        response = view(self.factory.get("/"), model_name="product", pk=999)
+        self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", price=100, currency="CZK",
+                is_published=True,
+            )
+            for i in range(2)
+        ]
+
+    def get_detail(self, product, **headers):
+        return ObjectDetailView.as_view()(
+            self.factory.get("/", **headers),
+            model_name="product",
+            pk=product.pk,
+        )
+
+    def test_list_not_modified(self):
+        view = ModelListView.as_view()
+        response = view(self.factory.get("/"), model_name="product")
+        self.assertIn("Last-Modified", response)
+        # Only the versions are loaded
+        with self.assertNumQueries(1):
+            response = view(
+                self.factory.get("/", HTTP_IF_NONE_MATCH=response["ETag"]),
+                model_name="product",
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_list_modified_by_import(self):
+        view = ModelListView.as_view()
+        etag = view(self.factory.get("/"), model_name="product")["ETag"]
+        Importer().run([{"Product": {"id": self.products[0].pk,
+                                     "nazev": "New"}}])
+        response = view(
+            self.factory.get("/", HTTP_IF_NONE_MATCH=etag),
+            model_name="product",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_not_modified(self):
+        response = self.get_detail(self.products[0])
+        # updated_on of the product, versions of the through models
+        with self.assertNumQueries(2):
+            response = self.get_detail(
+                self.products[0], HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_if_modified_since(self):
+        response = self.get_detail(self.products[0])
+        response = self.get_detail(
+            self.products[0],
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_tracks_changes_of_the_object(self):
+        first, second = self.products
+        etag = self.get_detail(first)["ETag"]
+
+        Importer().run([{"Product": {"id": second.pk, "nazev": "New"}}])
+        response = self.get_detail(first, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Importer().run([{"Product": {"id": first.pk, "nazev": "New"}}])
+        response = self.get_detail(first, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["name"], "New")
+
+
+class SerializerTestCase(TestCase):
+    def test_serialize_all_fields(self):
+        name = AttributeName.objects.create(name="Color", code="color")
+        attribute = Attribute.objects.create(name=name)
+        product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+        ProductAttribute.objects.create(product=product, attribute=attribute)
+        product.refresh_from_db()
+
+        data = get_serializer(Product).serialize(product)
+        self.assertEqual(data["price"], "100.00")
+        self.assertEqual(data["attributes"], [attribute.pk])
+        self.assertEqual(data["images"], [])
+        self.assertEqual(data["updated_on"], product.updated_on)
+        self.assertEqual(
+            get_serializer(Attribute).serialize(attribute, ["name"]),
+            {"name": name.pk},
+        )
+
+    def test_detail_returns_many_to_many_ids(self):
+        product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+        catalog = Catalog.objects.create(name="Catalog")
+        catalog.products.add(product)
+        response = ObjectDetailView.as_view()(
+            RequestFactory().get("/"), model_name="catalog", pk=catalog.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["products"], [product.pk])
+        self.assertEqual(data["attributes"], [])
+
+
+class CatalogDocumentTestCase(TestCase):
+    def setUp(self):
+        Importer().run(
+            [
+                {"AttributeName": {"id": 1, "nazev": "Color", "kod": "c"}},
+                {"AttributeValue": {"id": 1, "hodnota": "blue"}},
+                {"Attribute": {"id": 1, "nazev_atributu_id": 1,
+                               "hodnota_atributu_id": 1}},
+                {"Product": {"id": 1, "nazev": "Product 1", "cena": "10",
+                             "mena": "CZK", "description": "",
+                             "is_published": True}},
+                {"Product": {"id": 2, "nazev": "Product 2", "cena": "20",
+                             "mena": "CZK", "description": "",
+                             "is_published": True}},
+                {"ProductAttributes": {"id": 1, "attribute": 1,
+                                       "product": 1}},
+                {"Catalog": {"id": 1, "nazev": "Catalog 1",
+                             "products_ids": [1]}},
+                {"Catalog": {"id": 2, "nazev": "Catalog 2",
+                             "products_ids": [2]}},
+            ]
+        )
+
+    def get_document(self, pk):
+        response = self.client.get(reverse("catalog_document", args=[pk]))
+        return response.status_code, json.loads(response.content)
+
+    def test_document_is_read_with_one_query(self):
+        with self.assertNumQueries(1):
+            status, data = self.get_document(1)
+        self.assertEqual(status, 200)
+        self.assertEqual(data["name"], "Catalog 1")
+        self.assertEqual(
+            [product["name"] for product in data["products"]], ["Product 1"]
+        )
+        attribute = data["products"][0]["attributes"][0]
+        self.assertEqual(attribute["name"]["name"], "Color")
+        self.assertEqual(attribute["value"]["value"], "blue")
+
+    def test_import_rebuilds_affected_documents(self):
+        built_on = dict(
+            CatalogDocument.objects.values_list("catalog_id", "built_on")
+        )
+        Importer().run([{"AttributeValue": {"id": 1, "hodnota": "red"}}])
+        _, data = self.get_document(1)
+        attribute = data["products"][0]["attributes"][0]
+        self.assertEqual(attribute["value"]["value"], "red")
+        # Catalog 2 doesn't contain the attribute
+        self.assertEqual(
+            CatalogDocument.objects.get(pk=2).built_on, built_on[2]
+        )
+
+    def test_moved_link_rebuilds_both_documents(self):
+        Importer().run(
+            [{"ProductAttributes": {"id": 1, "attribute": 1, "product": 2}}]
+        )
+        _, first = self.get_document(1)
+        _, second = self.get_document(2)
+        self.assertEqual(first["products"][0]["attributes"], [])
+        self.assertEqual(len(second["products"][0]["attributes"]), 1)
+
+    def test_missing_document_is_built_on_read(self):
+        CatalogDocument.objects.all().delete()
+        status, data = self.get_document(2)
+        self.assertEqual(status, 200)
+        self.assertEqual(data["products"][0]["price"], "20.00")
+        self.assertTrue(CatalogDocument.objects.filter(pk=2).exists())
+
+    def test_missing_catalog(self):
+        status, data = self.get_document(99)
+        self.assertEqual(status, 404)
+        self.assertEqual(data["error"], "Catalog with ID 99 does not exist")
+
+
+class CatalogFacetsTestCase(TestCase):
+    def setUp(self):
+        facets._indexes.clear()
+        items = [
+            {"AttributeName": {"id": 1, "nazev": "Color", "kod": "color"}},
+            {"AttributeName": {"id": 2, "nazev": "Size", "kod": "size"}},
+        ]
+        for pk, value in enumerate(["blue", "green", "small", "large"], 1):
+            items.append({"AttributeValue": {"id": pk, "hodnota": value}})
+        # Attribute ID = value ID
+        for pk, name in [(1, 1), (2, 1), (3, 2), (4, 2)]:
+            items.append({"Attribute": {"id": pk, "nazev_atributu_id": name,
+                                        "hodnota_atributu_id": pk}})
+        # Product 1: blue, small; 2: blue, large; 3: green, large
+        links = [(1, 1), (1, 3), (2, 1), (2, 4), (3, 2), (3, 4)]
+        for pk in range(1, 5):
+            items.append({"Product": {"id": pk, "nazev": f"Product {pk}",
+                                      "cena": "10", "mena": "CZK",
+                                      "description": "",
+                                      "is_published": True}})
+        for pk, (product, attribute) in enumerate(links, 1):
+            items.append({"ProductAttributes": {"id": pk,
+                                                "product": product,
+                                                "attribute": attribute}})
+        items.append({"Catalog": {"id": 1, "nazev": "Catalog",
+                                  "products_ids": [1, 2, 3]}})
+        Importer().run(items)
+
+    def get_facets(self, selected=None):
+        response = self.client.get(
+            reverse("catalog_facets", args=[1]),
+            {"selected": selected} if selected else {},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data["count"], {
+            facet["code"]: {
+                value["value"]: value["count"] for value in facet["values"]
+            }
+            for facet in data["facets"]
+        }
+
+    def test_facets(self):
+        self.assertEqual(
+            self.get_facets(),
+            (3, {"color": {"blue": 2, "green": 1},
+                 "size": {"small": 1, "large": 2}}),
+        )
+
+    def test_selected_values(self):
+        # blue products, counts of other colors ignore the color selection
+        self.assertEqual(
+            self.get_facets("1:1"),
+            (2, {"color": {"blue": 2, "green": 1},
+                 "size": {"small": 1, "large": 1}}),
+        )
+        # blue or green, and large
+        self.assertEqual(
+            self.get_facets("1:1,1:2,2:4"),
+            (2, {"color": {"blue": 1, "green": 1},
+                 "size": {"small": 1, "large": 2}}),
+        )
+
+    def test_index_is_reused_until_import(self):
+        self.get_facets()
+        # Only the versions are loaded
+        with self.assertNumQueries(1):
+            self.get_facets("1:1")
+
+        Importer().run(
+            [{"ProductAttributes": {"id": 7, "product": 1, "attribute": 4}}]
+        )
+        _, counts = self.get_facets()
+        self.assertEqual(counts["size"], {"small": 1, "large": 3})
+
+    def test_invalid_requests(self):
+        response = self.client.get(
+            reverse("catalog_facets", args=[1]), {"selected": "1"}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("catalog_facets", args=[99]))
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchViewTestCase(TestCase):
+    def setUp(self):
+        products = [
+            (1, "Blue mug", "Ceramic mug", True),
+            (2, "Plate", "Plate matching the blue mug", True),
+            (3, "Red mug", "Ceramic mug", False),
+        ]
+        Importer().run(
+            [
+                {"Product": {"id": pk, "nazev": name, "description": text,
+                             "cena": "10", "mena": "CZK",
+                             "is_published": published}}
+                for pk, name, text, published in products
+            ]
+            + [{"Catalog": {"id": 1, "nazev": "Catalog",
+                            "products_ids": [2, 3]}}]
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse("search"), params)
+        self.assertEqual(response.status_code, 200)
+        return [product["id"] for product in response.json()["results"]]
+
+    def test_matches_in_name_rank_higher(self):
+        self.assertEqual(self.search(q="blue mug"), [1, 2])
+
+    def test_prefix_and_punctuation(self):
+        self.assertEqual(self.search(q='cera* "mug'), [1, 3])
+
+    def test_filters(self):
+        self.assertEqual(self.search(q="mug", is_published="true"), [1, 2])
+        self.assertEqual(self.search(q="mug", catalog="1"), [3, 2])
+        self.assertEqual(self.search(q="mug", limit="1"), [1])
+
+    def test_index_follows_import(self):
+        Importer().run([{"Product": {"id": 3, "nazev": "Green cup"}}])
+        self.assertEqual(self.search(q="red"), [])
+        self.assertEqual(self.search(q="green"), [3])
+
+    def test_invalid_query(self):
+        for params in [{}, {"q": " "}, {"q": "mug", "catalog": "x"},
+                       {"q": "mug", "catalog": "\u00b2"},
+                       {"q": "mug", "limit": "\u00b2"},
+                       {"q": "mug", "is_published": "maybe"}]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse("search"), params)
+                self.assertEqual(response.status_code, 400)
+
+
+class ManyToManySyncTestCase(TestCase):
+    def setUp(self):
+        items = [
+            {"Product": {"id": pk, "nazev": f"Product {pk}", "cena": "10",
+                         "mena": "CZK", "description": "",
+                         "is_published": True}}
+            for pk in range(1, 5)
+        ]
+        items += [
+            {"Catalog": {"id": 1, "nazev": "Catalog 1",
+                         "products_ids": [1, 2]}},
+            {"Catalog": {"id": 2, "nazev": "Catalog 2",
+                         "products_ids": [3]}},
+        ]
+        Importer().run(items)
+
+    def get_products(self, pk):
+        return sorted(
+            Catalog.objects.get(pk=pk).products.values_list("pk", flat=True)
+        )
+
+    def test_sync_adds_and_removes_links(self):
+        items = [
+            {"Catalog": {"id": 1, "products_ids": [2, 3, 4]}},
+            {"Catalog": {"id": 2, "products_ids": [3, 1]}},
+        ]
+        # Product references, existing catalog IDs, current links,
+        # delete, insert, updated_on of the relinked catalogs, two queries
+        # bumping the versions.
+        with self.assertNumQueries(8):
+            importer = Importer()
+            for item in items:
+                importer.add(item)
+            importer.flush(final=True)
+        self.assertEqual(self.get_products(1), [2, 3, 4])
+        self.assertEqual(self.get_products(2), [1, 3])
+
+    def test_references_are_loaded_in_chunks(self):
+        importer = Importer(batch_size=3)
+        # One query per 3 referenced products
+        with self.assertNumQueries(2):
+            importer.resolve(
+                Catalog, [{"id": 1, "products_ids": [1, 2, 3, 4, 5]}]
+            )
+        self.assertEqual(importer.known[Product], {1, 2, 3, 4})
+
+    def test_removed_links_are_deleted_in_chunks(self):
+        # Current links and one query per removed link
+        with self.assertNumQueries(3):
+            relinked = sync_many_to_many(Catalog, "products", {1: []}, 1)
+        self.assertEqual(relinked, {1})
+        self.assertEqual(self.get_products(1), [])
+
+    def test_empty_list_clears_relation(self):
+        Importer().run([{"Catalog": {"id": 1, "products_ids": []}}])
+        self.assertEqual(self.get_products(1), [])
+
+    def test_missing_key_keeps_relation(self):
+        Importer().run([{"Catalog": {"id": 1, "nazev": "Renamed"}}])
+        self.assertEqual(self.get_products(1), [1, 2])
+
+    def test_invalid_ids(self):
+        for ids in ["1", [1, "2"], None]:
+            with self.subTest(ids=ids):
+                with self.assertRaisesMessage(
+                    ImportDataError, "Expected a list of IDs"
+                ):
+                    Importer().run(
+                        [{"Catalog": {"id": 1, "products_ids": ids}}]
+                    )
+
+
+class MultiGetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for pk in range(1, 4):
+            AttributeName.objects.create(
+                pk=pk, name=f"Name {pk}", code=f"name{pk}"
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_ids(self):
+        # versions, objects
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("model_list", args=["attributename"]),
+                {"ids": "3,1,99,1", "fields": "name"},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "results": {"3": {"id": 3, "name": "Name 3"},
+                            "1": {"id": 1, "name": "Name 1"}},
+                "missing": [99],
             },
         )
+
+    def test_post_ids(self):
+        response = self.client.post(
+            reverse("model_list", args=["attributename"]),
+            data=json.dumps({"ids": list(range(1, 501))}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(list(data["results"]), ["1", "2", "3"])
+        self.assertEqual(len(data["missing"]), 497)
+
+    @override_settings(MULTI_GET_MAX_IDS=2)
+    def test_invalid_ids(self):
+        url = reverse("model_list", args=["attributename"])
+        for ids in ["1,x", "1,", "1,2,3"]:
+            with self.subTest(ids=ids):
+                response = self.client.get(url, {"ids": ids})
+                self.assertEqual(response.status_code, 400)
+        for body in [{"ids": "1"}, [1], {"ids": [True]}, {"ids": [1, 2, 3]}]:
+            with self.subTest(body=body):
+                response = self.client.post(
+                    url, data=json.dumps(body),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CHANGES_SAFETY_WINDOW=0)
+class ChangesViewTestCase(TestCase):
+    def setUp(self):
+        Importer().run(
+            [
+                {"AttributeValue": {"id": pk, "hodnota": f"Value {pk}"}}
+                for pk in range(1, 6)
+            ]
+        )
+        self.url = reverse("changes", args=["attributevalue"])
+
+    def get_changes(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_and_later_changes(self):
+        data = self.get_changes(since="2000-01-01", limit="3")
+        self.assertEqual([row["id"] for row in data["results"]], [1, 2, 3])
+        data = self.get_changes(after=data["next"], limit="3")
+        self.assertEqual([row["id"] for row in data["results"]], [4, 5])
+        self.assertIsNone(data["next"])
+        cursor = data["cursor"]
+
+        data = self.get_changes(after=cursor)
+        self.assertEqual(data["results"], [])
+        self.assertEqual(data["cursor"], cursor)
+
+        created_on = AttributeValue.objects.get(pk=2).created_on
+        Importer().run([{"AttributeValue": {"id": 2, "hodnota": "New"}}])
+        data = self.get_changes(after=cursor, fields="value")
+        self.assertEqual(data["results"], [{"id": 2, "value": "New"}])
+        self.assertEqual(
+            AttributeValue.objects.get(pk=2).created_on, created_on
+        )
+
+    def test_changed_links_are_reported(self):
+        Product.objects.create(
+            pk=1, name="Product", price=100, currency="CZK",
+            is_published=True,
+        )
+        Importer().run(
+            [{"Catalog": {"id": 1, "nazev": "Catalog", "products_ids": []}}]
+        )
+        self.url = reverse("changes", args=["catalog"])
+        cursor = self.get_changes()["cursor"]
+
+        importer = Importer()
+        importer.run([{"Catalog": {"id": 1, "products_ids": [1]}}])
+        self.assertEqual(importer.counts["Catalog"]["updated"], 1)
+        data = self.get_changes(after=cursor, fields="name")
+        self.assertEqual(data["results"], [{"id": 1, "name": "Catalog"}])
+
+    @override_settings(CHANGES_SAFETY_WINDOW=60)
+    def test_rows_committed_out_of_order_are_reported(self):
+        start = timezone.now()
+        AttributeValue.objects.update(updated_on=start - timedelta(hours=1))
+
+        def get_changes_at(seconds, **params):
+            now = start + timedelta(seconds=seconds)
+            with mock.patch("core.changes.timezone.now", return_value=now):
+                return self.get_changes(**params)
+
+        cursor = get_changes_at(0, since="2000-01-01")["cursor"]
+        # Writer A stamps row 1 at 10 s, but commits only after writer B
+        # stamped and committed row 2 at 30 s
+        AttributeValue.objects.filter(pk=2).update(
+            updated_on=start + timedelta(seconds=30)
+        )
+        data = get_changes_at(40, after=cursor)
+        self.assertEqual(data["results"], [])
+        cursor = data["cursor"]
+        AttributeValue.objects.filter(pk=1).update(
+            updated_on=start + timedelta(seconds=10)
+        )
+        data = get_changes_at(100, after=cursor)
+        self.assertEqual([row["id"] for row in data["results"]], [1, 2])
+
+    def test_import_transaction_stamps_rows_before_commit(self):
+        def items():
+            for pk in [1, 2]:
+                yield {"AttributeValue": {"id": pk, "hodnota": f"New {pk}"}}
+            self.last_item_on = timezone.now()
+
+        Importer(batch_size=1, atomic=ATOMIC_PAYLOAD).run(items())
+        for obj in AttributeValue.objects.filter(pk__in=[1, 2]):
+            self.assertGreaterEqual(obj.updated_on, self.last_item_on)
+
+    def test_since_in_the_future(self):
+        data = self.get_changes(since="2999-01-01T00:00:00Z")
+        self.assertEqual(data["results"], [])
+
+    def test_invalid_parameters(self):
+        for params in [{"since": "yesterday"}, {"after": "x"},
+                       {"fields": "invalid"}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("changes", args=["importjob"]))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse("changes", args=["catalog_products"])
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkTestCase(TestCase):
+    def test_benchmark_of_small_catalog(self):
+        results = run_benchmark(
+            products=5, attributes=2, images=1, catalogs=2, requests=2
+        )
+        self.assertEqual(
+            list(results),
+            ["import", "reimport", "list", "list_expanded", "detail"],
+        )
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(ProductAttribute.objects.count(), 10)
+        self.assertEqual(Catalog.objects.get(pk=2).products.count(), 2)
+        # Nothing is written by the unchanged import
+        self.assertLess(
+            results["reimport"]["queries"], results["import"]["queries"]
+        )
+
+    def test_find_regressions(self):
+        baseline = {
+            "import": {"rows_per_second": 1000, "queries": 10},
+            "detail": {"p95_ms": 10.0, "queries": 3},
+        }
+        results = {
+            "import": {"rows_per_second": 850, "queries": 10},
+            "detail": {"p95_ms": 12.5, "queries": 4},
+        }
+        self.assertEqual(
+            find_regressions(results, baseline, 0.2),
+            ["detail p95_ms: 10.0 -> 12.5", "detail queries: 3 -> 4"],
+        )
+
+    @override_settings(
+        CACHES={
+            **settings.CACHES,
+            "responses": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "responses",
+            },
+        },
+        RESPONSE_CACHE="responses",
+    )
+    def test_requests_are_measured_with_empty_response_cache(self):
+        url = reverse("model_list", args=["attributevalue"])
+        self.client.get(url)
+        # Versions and the page, a cached response needs only the former
+        results = measure_requests(self.client, [url, url], "default")
+        self.assertEqual(results["queries"], 2)
+
+    def test_unknown_database(self):
+        with self.assertRaisesMessage(CommandError, "Unknown database: x"):
+            call_command("bench", "--database", "x")
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        AttributeName.objects.create(pk=1, name="Color", code="color")
+
+    def test_requests_are_recorded(self):
+        self.client.get(reverse("object_detail", args=["attributename", 1]))
+        self.client.get(reverse("object_detail", args=["attributename", 2]))
+        self.client.post(
+            reverse("import_objects"),
+            data=json.dumps([{"AttributeValue": {"id": 1, "hodnota": "x"}}]),
+            content_type="application/json",
+        )
+        content = self.client.get(reverse("metrics")).content.decode()
+        for line in [
+            'whysapi_requests_total{route="object_detail",method="GET",'
+            'status="200"} 1',
+            'whysapi_requests_total{route="object_detail",method="GET",'
+            'status="404"} 1',
+            'whysapi_request_duration_seconds_count{route="object_detail",'
+            'method="GET"} 2',
+            'whysapi_import_rows_total{model="AttributeValue",'
+            'result="created"} 1',
+        ]:
+            self.assertIn(line, content)
+        self.assertRegex(
+            content, r'whysapi_db_queries_total\{route="object_detail"\} \d+'
+        )
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("core.metrics", "WARNING") as logs:
+            self.client.get(
+                reverse("object_detail", args=["attributename", 1])
+            )
+        self.assertIn(
+            "Slow request GET /detail/attributename/1/", logs.output[0]
+        )
+        self.assertIn("core_attributename", logs.output[0])
+
+
+class AsyncViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        name = AttributeName.objects.create(name="Color", code="color")
+        values = [
+            AttributeValue.objects.create(value=f"Value {i}")
+            for i in range(3)
+        ]
+        cls.product = Product.objects.create(
+            name="Product", price=100, currency="CZK", is_published=True
+        )
+        for value in values:
+            attribute = Attribute.objects.create(name=name, value=value)
+            ProductAttribute.objects.create(
+                product=cls.product, attribute=attribute
+            )
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.factory = AsyncRequestFactory()
+
+    async def test_list_pages(self):
+        response = await AsyncModelListView.as_view()(
+            self.factory.get("/", {"limit": 2}), model_name="attributevalue"
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [obj["value"] for obj in data["results"]], ["Value 0", "Value 1"]
+        )
+        self.assertIsNotNone(data["next"])
+        self.assertIn("ETag", response)
+
+    async def test_list_matches_sync_view(self):
+        params = {"all": "1", "expand": "attributes.value"}
+        response = await AsyncModelListView.as_view()(
+            self.factory.get("/", params), model_name="product"
+        )
+        cache.clear()
+        expected = await sync_to_async(ModelListView.as_view())(
+            RequestFactory().get("/", params), model_name="product"
+        )
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+    async def test_get_many(self):
+        value = await AttributeValue.objects.afirst()
+        view = AsyncModelListView.as_view()
+        response = await view(
+            self.factory.get("/", {"ids": f"{value.pk},0"}),
+            model_name="attributevalue",
+        )
+        data = json.loads(response.content)
+        self.assertEqual(list(data["results"]), [str(value.pk)])
+        self.assertEqual(data["missing"], [0])
+
+        response = await view(
+            self.factory.post(
+                "/",
+                json.dumps({"ids": [value.pk]}),
+                content_type="application/json",
+            ),
+            model_name="attributevalue",
+        )
+        self.assertEqual(
+            list(json.loads(response.content)["results"]), [str(value.pk)]
+        )
+
+    async def test_stream(self):
+        response = await AsyncModelListView.as_view()(
+            self.factory.get(
+                "/", {"stream": "1", "expand": "attributes.value"}
+            ),
+            model_name="product",
+        )
+        self.assertTrue(response.is_async)
+        data = json.loads(b"".join([part async for part in response]))
+        self.assertEqual(
+            [attribute["value"]["value"] for attribute in
+             data[0]["attributes"]],
+            ["Value 0", "Value 1", "Value 2"],
+        )
+
+    async def test_invalid_query(self):
+        response = await AsyncModelListView.as_view()(
+            self.factory.get("/", {"limit": "x"}), model_name="attributevalue"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_detail(self):
+        view = AsyncObjectDetailView.as_view()
+        response = await view(
+            self.factory.get("/", {"expand": "attributes.name"}),
+            model_name="product",
+            pk=self.product.pk,
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [attribute["name"]["code"] for attribute in data["attributes"]],
+            ["color"] * 3,
+        )
+
+        response = await view(
+            self.factory.get("/"), model_name="product", pk=0
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_of_through_model(self):
+        catalog = await Catalog.objects.acreate(name="Catalog")
+        attribute = await Attribute.objects.afirst()
+        await sync_to_async(catalog.attributes.add)(attribute)
+        link = await Catalog.attributes.through.objects.aget()
+        response = await AsyncObjectDetailView.as_view()(
+            self.factory.get("/"),
+            model_name="catalog_attributes",
+            pk=link.pk,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content)["attribute"], attribute.pk
+        )
+
+    async def test_middleware_counts_queries_of_async_views(self):
+        async def get_response(request):
+            return await AsyncObjectDetailView.as_view()(
+                request, model_name="product", pk=self.product.pk
+            )
+
+        middleware = MetricsMiddleware(get_response)
+        response = await middleware(self.factory.get("/"))
+        self.assertEqual(response.status_code, 200)
+        # updated_on, versions, product, its attributes and image IDs
+        self.assertEqual(metrics.queries["unmatched"], 5)
+
+
+class AsyncStreamingTestCase(SimpleTestCase):
+    @staticmethod
+    async def parts():
+        for part in ["[", "1", "]"]:
+            yield part
+
+    async def test_asgi_handler_sends_async_content(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        response = AsyncStreamingHttpResponse(
+            self.parts(), content_type="application/json"
+        )
+        await ASGIHandler().send_response(response, send)
+        self.assertEqual(messages[0]["type"], "http.response.start")
+        self.assertEqual(
+            b"".join(message.get("body", b"") for message in messages[1:]),
+            b"[1]",
+        )
+        self.assertFalse(messages[-1].get("more_body", False))
+
+    def test_sync_iteration(self):
+        response = AsyncStreamingHttpResponse(self.parts())
+        self.assertEqual(b"".join(response), b"[1]")
+
+    @override_settings(LIST_STREAM_CHUNK_SIZE=2)
+    def test_sync_iteration_of_several_chunks(self):
+        async def rows():
+            for i in range(5):
+                yield {"id": i}
+
+        response = AsyncStreamingHttpResponse(aiter_json_array(rows()))
+        self.assertEqual(
+            json.loads(b"".join(response)), [{"id": i} for i in range(5)]
+        )
+
+
+class ASGIHandlerTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        for i in range(3):
+            AttributeValue.objects.create(value=f"Value {i}")
+
+    async def request(self, path, query_string):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query_string,
+            "headers": [(b"host", b"localhost")],
+        }
+        await ASGIHandler()(scope, receive, send)
+        return messages
+
+    async def test_sync_streaming_response(self):
+        with override_settings(LIST_STREAM_CHUNK_SIZE=2):
+            messages = await self.request(
+                reverse("model_list", args=["attributevalue"]), b"stream=1"
+            )
+        self.assertEqual(messages[0]["status"], 200)
+        data = json.loads(
+            b"".join(message.get("body", b"") for message in messages[1:])
+        )
+        self.assertEqual(
+            [obj["value"] for obj in data], [f"Value {i}" for i in range(3)]
+        )
+        self.assertEqual(metrics.requests[("model_list", "GET", 200)], 1)
@@ -0,0 +1,200 @@
+"""
+Translation of imported rows to field values of the models.
+
+A plan is built once per source model name (e.g. ``ProductAttributes``)
+with the model, a mapping of source keys (e.g. ``nazev``) to field names
+restricted to the model's editable fields, and coercers converting
+values like the ORM would and checking them against the field's
+definition (null, max_length, max_digits, URL format, ...). Primary
+and foreign keys are checked against the integer range of the database
+column, which Django doesn't validate for them. Rows are then
+translated in one pass without mutating them, and unknown keys and
+invalid values are rejected before they reach the database.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Callable, Optional
+
+from django.core.exceptions import FieldError, ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection
+from django.db.models import BooleanField, DateTimeField, DecimalField
+from django.utils import timezone
+
+from core import const
+from core.utils import get_model, swap_string
+
+# Import keys of many-to-many relations -> field names
+M2M_KEYS = {"attributes_ids": "attributes", "products_ids": "products"}
+
+
+def get_converter(field) -> Callable:
+    """
+    Return function converting imported values of the field
+    to its Python type.
+
+    :param field: Model field
+    """
+    if isinstance(field, BooleanField):
+
+        def convert(value):
+            if isinstance(value, str):
+                value = {"true": True, "false": False}.get(
+                    value.lower(), value
+                )
+            return field.to_python(value)
+
+        return convert
+    if isinstance(field, DecimalField):
+
+        def convert(value):
+            # JSON numbers are floats, whose conversion by to_python keeps
+            # max_digits significant digits and fails decimal_places
+            if isinstance(value, float):
+                value = Decimal(str(value))
+            return field.to_python(value)
+
+        return convert
+    if isinstance(field, DateTimeField):
+
+        def convert(value):
+            value = field.to_python(value)
+            if value is not None and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            return value
+
+        return convert
+    return field.to_python
+
+
+def get_range_validators(field) -> list:
+    """
+    Return validators of the integer range of the database column
+    of a key, or of the key it references. Unlike integer fields, keys
+    don't have them, and too large IDs overflow database queries.
+
+    :param field: Primary key, foreign key or many-to-many field
+    """
+    target = field.target_field if field.is_relation else field
+    # integer_field_range() is unbounded on SQLite, whose driver still
+    # can't bind integers beyond 64 bits
+    value_range = connection.ops.integer_field_ranges.get(
+        target.get_internal_type()
+    )
+    if value_range is None:
+        return []
+    min_value, max_value = value_range
+    return [MinValueValidator(min_value), MaxValueValidator(max_value)]
+
+
+def get_coercer(field) -> Callable:
+    """
+    Return function converting imported values of the field
+    and checking them against the field's definition.
+
+    :param field: Model field
+    """
+    convert = get_converter(field)
+    validators = list(field.validators)
+    if field.primary_key or field.is_relation:
+        validators += get_range_validators(field)
+
+    def coerce(value):
+        value = convert(value)
+        if value is None:
+            if not field.null:
+                raise ValidationError(field.error_messages["null"])
+            return value
+        for validator in validators:
+            validator(value)
+        return value
+
+    return coerce
+
+
+def get_ids_coercer(field) -> Callable:
+    """
+    Return function checking that a value of a many-to-many key
+    is a list of IDs of the related model.
+
+    :param field: Many-to-many field
+    """
+    validators = get_range_validators(field)
+
+    def coerce_ids(value) -> list:
+        if not isinstance(value, list) or not all(
+            isinstance(item, int) and not isinstance(item, bool)
+            for item in value
+        ):
+            raise ValidationError("Expected a list of IDs")
+        for item in value:
+            for validator in validators:
+                validator(item)
+        return value
+
+    return coerce_ids
+
+
+class TranslationPlan:
+    """
+    Translation of rows of one source model name.
+
+    :param model: Model class the rows are imported to
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = model.__name__
+
+        # Target key -> coercer. Foreign keys are imported by attname.
+        targets: dict[str, Callable] = {}
+        for field in model._meta.concrete_fields:
+            if field.editable or field.primary_key:
+                targets[field.attname] = get_coercer(field)
+        m2m_fields = {field.name: field for field in model._meta.many_to_many}
+        for key, name in M2M_KEYS.items():
+            if name in m2m_fields:
+                targets[key] = get_ids_coercer(m2m_fields[name])
+
+        self.keys: dict[str, tuple[str, Callable]] = {
+            key: (key, coerce) for key, coerce in targets.items()
+        }
+        for source, target in const.IMPORT_MAPPING.items():
+            if target in targets:
+                self.keys[source] = (target, targets[target])
+
+    def translate(self, row: dict) -> dict:
+        """
+        Return a new row with field names as keys and coerced values.
+
+        :param row: Imported row
+        :raises FieldError: If a key doesn't match any field
+        :raises ValidationError: If a value can't be coerced
+        """
+        data = {}
+        for key, value in row.items():
+            try:
+                target, coerce = self.keys[key]
+            except KeyError:
+                raise FieldError(f"Invalid field name: {key}") from None
+            try:
+                data[target] = coerce(value)
+            except ValidationError as e:
+                raise ValidationError(
+                    f"{key}: {' '.join(e.messages)}"
+                ) from None
+        return data
+
+
+@lru_cache(maxsize=None)
+def get_translation_plan(source_name: str) -> Optional[TranslationPlan]:
+    """
+    Return translation plan of a source model name, or None if it
+    doesn't match any importable model. Plans are built once.
+
+    :param source_name: Model name used in the payload
+    """
+    model = get_model(swap_string(source_name))
+    if not model:
+        return None
+    return TranslationPlan(model)
@@ -1,17 +1,47 @@
+from django.conf import settings
 from django.urls import path
 
 from core import views
 
+if settings.ASYNC_READ_VIEWS:
+    ModelListView = views.AsyncModelListView
+    ObjectDetailView = views.AsyncObjectDetailView
+else:
+    ModelListView = views.ModelListView
+    ObjectDetailView = views.ObjectDetailView
+
 urlpatterns = [
     path("import/", views.ImportObjectsView.as_view(), name="import_objects"),
+    path(
+        "import/<uuid:job_id>/",
+        views.ImportJobView.as_view(),
+        name="import_job",
+    ),
     path(
         "detail/<str:model_name>/",
-        views.ModelListView.as_view(),
+        ModelListView.as_view(),
         name="model_list",
     ),
     path(
         "detail/<str:model_name>/<int:pk>/",
-        views.ObjectDetailView.as_view(),
+        ObjectDetailView.as_view(),
         name="object_detail",
     ),
+    path(
+        "catalog/<int:pk>/",
+        views.CatalogDocumentView.as_view(),
+        name="catalog_document",
+    ),
+    path(
+        "catalog/<int:pk>/facets/",
+        views.CatalogFacetsView.as_view(),
+        name="catalog_facets",
+    ),
+    path("search/", views.SearchView.as_view(), name="search"),
+    path(
+        "changes/<str:model_name>/",
+        views.ChangesView.as_view(),
+        name="changes",
+    ),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
 ]
@@ -1,11 +1,26 @@
-from typing import Optional
+from itertools import islice
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
 from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db.models import Model
 
 from core import const
 
 
+class InvalidQueryError(ValueError):
+    """
+    Raised when query string parameters of a request are not valid.
+    """
+
+
 def swap_string(string: str) -> str:
     """
     Swap string using IMPORT_MAPPING dictionary
@@ -16,53 +31,100 @@ def swap_string(string: str) -> str:
     return const.IMPORT_MAPPING.get(string, string)
 
 
-def fix_keys_in_dict(dictionary: dict) -> dict:
+def iter_chunks(items: Iterable, size: int) -> Iterator[list]:
     """
-    Swap keys in dictionary using swap_string function.
+    Split items into lists of at most the given size.
 
-    :param dictionary: Dictionary to fix
+    :param items: Iterable of items
+    :param size: Maximum size of a chunk
     """
-    for key in list(dictionary):  # Force copy of keys to prevent RuntimeError
-        dictionary[swap_string(key)] = dictionary.pop(key)
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
 
-    return dictionary
+
+async def aiter_chunks(
+    items: AsyncIterable, size: int
+) -> AsyncIterator[list]:
+    """
+    Async version of iter_chunks.
+
+    :param items: Async iterable of items
+    :param size: Maximum size of a chunk
+    """
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 def get_model(model_name: str) -> Optional[Model]:
     """
     Return model class if found, otherwise return None.
+    Models listed in PRIVATE_MODELS are never returned.
 
     :param model_name: Name of the model
     """
+    if model_name.lower() in const.PRIVATE_MODELS:
+        return None
     try:
         return apps.get_model(app_label="core", model_name=model_name)
     except LookupError:
         return None
 
 
-def create_obj(model, obj_data: dict) -> tuple[Model, bool]:
+def parse_fields(params, allowed: list[str], pk_name: str) -> list[str]:
     """
-    Create model object from dictionary. Returns 2-tuple of (object, created).
+    Return field names requested by ``?fields=``, always including
+    the primary key, or all allowed fields if no fields were requested.
 
-    :param model: Model class
-    :param obj_data: Dictionary with object data
-    :raises AttributeError: If model has no attribute with given name
-    :raises ValueError: If value is not valid
-    :raises IntegrityError: If field's value violates database integrity
-    :raises ValidationError: If field's value is not valid
-    :raises FieldError: If field name is not valid
+    :param params: Query string parameters
+    :param allowed: Names of fields which may be requested
+    :param pk_name: Name of the primary key field
+    :raises InvalidQueryError: If an unknown field is requested
     """
+    value = params.get("fields")
+    if value is None:
+        return allowed
 
-    attributes_ids: list = obj_data.pop("attributes_ids", None)
-    products_ids: list = obj_data.pop("products_ids", None)
+    fields = [pk_name]
+    for name in value.split(","):
+        name = name.strip()
+        if name not in allowed:
+            raise InvalidQueryError(f"Invalid field name: {name}")
+        if name not in fields:
+            fields.append(name)
+    return fields
 
-    obj, created = model.objects.update_or_create(
-        id=obj_data["id"], defaults=fix_keys_in_dict(obj_data)
-    )
 
-    if attributes_ids:
-        obj.attributes.set(attributes_ids)
-    if products_ids:
-        obj.products.set(products_ids)
+def parse_ids(model, values: list) -> list:
+    """
+    Return unique primary keys converted to Python values,
+    in the order of the first occurrence.
 
-    return obj, created
+    :param model: Model class
+    :param values: Requested IDs, e.g. strings from the query string
+    :raises InvalidQueryError: If an ID is not valid or more than
+        MULTI_GET_MAX_IDS IDs are requested
+    """
+    pk_field = model._meta.pk
+    ids = {}
+    for value in values:
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            pk = pk_field.to_python(value)
+        except ValidationError:
+            pk = None
+        if pk is None or isinstance(value, (bool, list, dict)):
+            raise InvalidQueryError(f"Invalid ID: {value}")
+        ids[pk] = None
+    if len(ids) > settings.MULTI_GET_MAX_IDS:
+        raise InvalidQueryError(
+            f"Too many IDs, the maximum is {settings.MULTI_GET_MAX_IDS}"
+        )
+    return list(ids)
@@ -0,0 +1,111 @@
+"""
+Per-model data versions.
+
+Every model's version is increased whenever its objects change, either
+by the importer or through the ORM (signals), and is used to invalidate
+cached responses. Versions are stored in the database, so they are shared
+by all web processes.
+"""
+from typing import Iterable
+
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from core import const
+from core.models import ModelVersion
+
+
+def get_version_name(model) -> str:
+    """
+    Return name under which the model's version is stored.
+
+    :param model: Model class
+    """
+    return model._meta.model_name
+
+
+def bump_versions(models: Iterable) -> None:
+    """
+    Increase versions of the given models using two queries.
+
+    :param models: Model classes whose data changed
+    """
+    names = {get_version_name(model) for model in models}
+    if not names:
+        return
+
+    now = timezone.now()
+    ModelVersion.objects.bulk_create(
+        [ModelVersion(model=name, changed_on=now) for name in names],
+        ignore_conflicts=True,
+    )
+    ModelVersion.objects.filter(model__in=names).update(
+        version=F("version") + 1, changed_on=now
+    )
+
+
+def get_versions(models: Iterable) -> dict[str, tuple]:
+    """
+    Return 2-tuples of (version, changed_on) by model name, loaded with
+    one query. Models which never changed are missing from the result.
+
+    :param models: Model classes
+    """
+    return {
+        name: (version, changed_on)
+        for name, version, changed_on in get_versions_queryset(models)
+    }
+
+
+async def aget_versions(models: Iterable) -> dict[str, tuple]:
+    """
+    Async version of get_versions.
+
+    :param models: Model classes
+    """
+    return {
+        name: (version, changed_on)
+        async for name, version, changed_on in get_versions_queryset(models)
+    }
+
+
+def get_versions_queryset(models: Iterable) -> QuerySet:
+    """
+    Return queryset of (model name, version, changed_on) tuples.
+
+    :param models: Model classes
+    """
+    names = {get_version_name(model) for model in models}
+    return ModelVersion.objects.filter(model__in=names).values_list(
+        "model", "version", "changed_on"
+    )
+
+
+def is_tracked(model) -> bool:
+    """
+    Whether changes of the model's objects are tracked.
+
+    :param model: Model class
+    """
+    return (
+        model._meta.app_label == "core"
+        and model._meta.model_name not in const.PRIVATE_MODELS
+    )
+
+
+def bump_sender_version(sender, **kwargs) -> None:
+    """
+    Signal receiver increasing version of the sender model
+    after an object was saved or deleted through the ORM.
+    """
+    if is_tracked(sender):
+        bump_versions([sender])
+
+
+def bump_m2m_version(sender, instance, action, model, **kwargs) -> None:
+    """
+    Signal receiver increasing versions of both sides of a changed
+    many-to-many relation and of its through model.
+    """
+    if action.startswith("post_") and is_tracked(type(instance)):
+        bump_versions([type(instance), model, sender])
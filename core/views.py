@@ -1,84 +1,223 @@
 import json
+import shutil
+from tempfile import SpooledTemporaryFile
+from typing import Iterable, Optional
 
-from django.core.exceptions import ValidationError, FieldError
-from django.db import IntegrityError
-from django.forms import model_to_dict
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from core.utils import swap_string, get_model, create_obj
+from core.cache import acached_response, cached_response, get_dependencies
+from core.changes import get_changes
+from core.documents import get_document
+from core.expand import (
+    parse_expand,
+    with_related,
+    expand_object,
+    expand_rows,
+    aiter_expanded_rows,
+    iter_expanded_rows,
+)
+from core.facets import get_facet_index, parse_selected
+from core.filters import filter_queryset, get_ordering
+from core.importer import Importer, ImportDataError, ATOMIC_MODES
+from core.jobs import create_import_job
+from core.metrics import metrics
+from core.models import ImportJob, Product, TrackedModel
+from core.parsers import CHUNK_SIZE, iter_items
+from core.pagination import apaginate, get_limit, paginate, order_queryset
+from core.search import filter_catalog, search_products
+from core.serializers import get_serializer
+from core.streaming import astream_rows, stream_rows
+from core.utils import (
+    get_model,
+    parse_fields,
+    parse_ids,
+    InvalidQueryError,
+)
 
 
-def import_data(body: list) -> JsonResponse:
+def import_data(
+    stream,
+    content_type: str,
+    batch_size: Optional[int] = None,
+    atomic: Optional[str] = None,
+    dry_run: bool = False,
+) -> JsonResponse:
     """
-    Import model objects from JSON data.
+    Import model objects from JSON data. The payload is validated
+    before anything is written, so it's spooled to a temporary file
+    (in memory up to FILE_UPLOAD_MAX_MEMORY_SIZE) and parsed twice.
+
+    :param stream: Binary file-like object with the payload
+    :param content_type: Content type of the payload
+    :param batch_size: Number of rows written per query,
+        defaults to settings.IMPORT_BATCH_SIZE
+    :param atomic: Transaction mode, see core.importer.Importer
+    :param dry_run: Only validate the payload
+    :returns: Response with the numbers of created, updated
+        and unchanged rows per model
     """
-    for obj_dict in body:
-        # Get model name from the first key in the dictionary
-        model_name = swap_string(next(iter(obj_dict)))
-        model = get_model(model_name)
-        if not model:
+    importer = Importer(batch_size=batch_size, atomic=atomic)
+    with SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    ) as payload:
+        shutil.copyfileobj(stream, payload, CHUNK_SIZE)
+
+        def open_items() -> Iterable[dict]:
+            payload.seek(0)
+            return iter_items(payload, content_type)
+
+        try:
+            importer.run_validated(open_items, dry_run=dry_run)
+        except json.JSONDecodeError:
             return JsonResponse(
-                {
-                    "status": "error",
-                    "error": f"Invalid model name: {model_name}",
-                },
-                status=400,
+                {"status": "error", "error": "Invalid JSON"}, status=400
             )
+        except ImportDataError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+    if importer.error_count:
+        return JsonResponse(
+            {
+                "status": "error",
+                "error": (
+                    f"{importer.error_count} rows could not be imported"
+                    if atomic
+                    else importer.errors[0]["error"]
+                ),
+                "errors": importer.errors,
+                "rows": importer.counts,
+            },
+            status=400,
+        )
+
+    if dry_run:
+        return JsonResponse({"status": "valid"})
+    return JsonResponse({"status": "success", "rows": importer.counts})
+
 
-        obj_data: dict = next(iter(obj_dict.values()))
+@method_decorator(csrf_exempt, name="dispatch")
+class ImportObjectsView(View):
+    """
+    View for importing objects from JSON.
+    """
+
+    def post(self, *args, **kwargs):
+        """
+        Import objects from a JSON array or from newline delimited JSON
+        (application/x-ndjson). The request body is parsed incrementally.
+
+        With ``?transaction=payload`` or ``?transaction=chunk`` the whole
+        payload or every chunk of rows is imported in one transaction
+        and all invalid rows are reported instead of stopping at the first.
 
-        if not obj_data.get("id"):
+        The whole payload is validated first. Without a transaction mode
+        nothing is written if any row is invalid, and all invalid rows
+        are reported. ``?dry_run=1`` only validates the payload.
+
+        With ``?async=1`` the payload is stored and imported in the
+        background, returning 202 with the ID of the import job.
+        """
+        batch_size = self.request.GET.get("batch_size")
+        if batch_size is not None:
+            if not batch_size.isdecimal() or int(batch_size) < 1:
+                return JsonResponse(
+                    {"status": "error", "error": "Invalid batch size"},
+                    status=400,
+                )
+            batch_size = int(batch_size)
+
+        atomic = self.request.GET.get("transaction")
+        if atomic is not None and atomic not in ATOMIC_MODES:
             return JsonResponse(
                 {
                     "status": "error",
-                    "error": f"Missing ID for {model_name}",
+                    "error": f"Invalid transaction mode: {atomic}",
                 },
                 status=400,
             )
 
-        try:
-            create_obj(model, obj_data)
-        except (
-            AttributeError,
-            ValueError,
-            IntegrityError,
-            ValidationError,
-            FieldError,
-        ) as e:
+        dry_run = self.request.GET.get("dry_run") == "1"
+        if self.request.GET.get("async") == "1" and not dry_run:
+            job = create_import_job(
+                self.request,
+                self.request.content_type,
+                batch_size=batch_size,
+                atomic=atomic,
+            )
             return JsonResponse(
                 {
-                    "status": "error",
-                    "error": f"Invalid data for {model_name}: {e}",
+                    "status": "accepted",
+                    "job": job.id,
+                    "url": reverse("import_job", args=[job.id]),
                 },
-                status=400,
+                status=202,
             )
 
-    return JsonResponse({"status": "success"})
+        return import_data(
+            self.request,
+            self.request.content_type,
+            batch_size=batch_size,
+            atomic=atomic,
+            dry_run=dry_run,
+        )
 
 
-@method_decorator(csrf_exempt, name="dispatch")
-class ImportObjectsView(View):
+class ImportJobView(View):
     """
-    View for importing objects from JSON.
+    View reporting progress of a background import job.
     """
 
-    def post(self, *args, **kwargs):
+    def get(self, *args, **kwargs):
         """
-        Import objects from JSON.
+        Return status, rows processed per model, throughput
+        and the first error of an import job.
         """
+        job_id = self.kwargs["job_id"]
         try:
-            body = json.loads(self.request.body)
-        except json.JSONDecodeError:
+            job = ImportJob.objects.get(pk=job_id)
+        except ImportJob.DoesNotExist:
             return JsonResponse(
-                {"status": "error", "error": "Invalid JSON"}, status=400
+                {
+                    "status": "error",
+                    "error": f"Import job with ID {job_id} does not exist",
+                },
+                status=404,
             )
 
-        return import_data(body)
+        rows = sum(job.processed.values())
+        rows_per_second = None
+        if job.started_on:
+            elapsed = (job.finished_on or timezone.now()) - job.started_on
+            if elapsed.total_seconds() > 0:
+                rows_per_second = round(rows / elapsed.total_seconds(), 1)
+
+        return JsonResponse(
+            {
+                "id": job.id,
+                "status": job.status,
+                "processed": job.processed,
+                "rows": rows,
+                "rows_per_second": rows_per_second,
+                "error": job.error,
+                "error_count": job.error_count,
+                "created_on": job.created_on,
+                "started_on": job.started_on,
+                "finished_on": job.finished_on,
+            }
+        )
 
 
+@method_decorator(csrf_exempt, name="dispatch")
 class ModelListView(View):
     """
     View for listing objects for a given model.
@@ -86,7 +225,17 @@ class ModelListView(View):
 
     def get(self, *args, **kwargs):
         """
-        List objects for a given model.
+        List objects for a given model, one page at a time.
+        Use ``?limit=`` to set the page size and pass the returned
+        ``next`` cursor as ``?after=`` to get the following page.
+        ``?all=1`` returns all objects as one list, without pagination.
+        ``?ids=1,2,3`` returns objects with the given IDs keyed by ID.
+        ``?stream=1`` streams all objects as a JSON array, or as newline
+        delimited JSON with ``?format=ndjson``.
+        ``?fields=id,name`` selects the returned fields.
+        ``?expand=attributes.name,images`` nests related objects.
+        Objects can be filtered and ordered (``?ordering=-price``)
+        as listed in core.filters.
         """
         model_name = self.kwargs["model_name"]
         model = get_model(model_name)
@@ -98,7 +247,200 @@ class ModelListView(View):
                 },
                 status=400,
             )
-        return JsonResponse(list(model.objects.values()), safe=False)
+
+        params = self.request.GET
+        try:
+            fields, tree, ordering, queryset = self.parse_query(model)
+
+            if "ids" in params:
+                ids = parse_ids(model, params["ids"].split(","))
+                return cached_response(
+                    self.request,
+                    get_dependencies(model, [], tree),
+                    lambda: self.get_many(model, queryset, ids, fields, tree),
+                )
+
+            if params.get("stream") == "1":
+                chunk_size = settings.LIST_STREAM_CHUNK_SIZE
+                rows = order_queryset(
+                    queryset.values(*fields), ordering
+                ).iterator(chunk_size=chunk_size)
+                if tree:
+                    rows = iter_expanded_rows(model, rows, tree, chunk_size)
+                return stream_rows(self.request, rows)
+
+            return cached_response(
+                self.request,
+                get_dependencies(model, [], tree),
+                lambda: self.list(model, queryset, fields, tree, ordering),
+            )
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+    def post(self, *args, **kwargs):
+        """
+        Return objects with IDs listed in the JSON body,
+        ``{"ids": [1, 2, 3]}``, same as ``?ids=1,2,3``.
+        Query string parameters work as with GET.
+        """
+        model_name = self.kwargs["model_name"]
+        model = get_model(model_name)
+        if not model:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Invalid model name: {model_name}",
+                },
+                status=400,
+            )
+
+        try:
+            ids, fields, tree, queryset = self.parse_body(model)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        return self.get_many(model, queryset, ids, fields, tree)
+
+    def parse_body(self, model) -> tuple[list, list[str], dict, QuerySet]:
+        """
+        Return 4-tuple of (IDs from the JSON body, fields, expanded
+        relations, filtered queryset) of a POST request.
+
+        :param model: Model class
+        :raises InvalidQueryError: If the body or query string is not valid
+        """
+        try:
+            body = json.loads(self.request.body)
+        except json.JSONDecodeError:
+            raise InvalidQueryError("Invalid JSON")
+        ids = body.get("ids") if isinstance(body, dict) else None
+        if not isinstance(ids, list):
+            raise InvalidQueryError("Missing list of IDs")
+        ids = parse_ids(model, ids)
+        fields, tree, _, queryset = self.parse_query(model, ordering=False)
+        return ids, fields, tree, queryset
+
+    def get_many(
+        self,
+        model,
+        queryset: QuerySet,
+        ids: list,
+        fields: list[str],
+        tree: dict,
+    ) -> JsonResponse:
+        """
+        Return objects with the given IDs keyed by ID, loaded with
+        one query, and the list of IDs which were not found.
+
+        :param model: Model class
+        :param queryset: Filtered queryset of the model
+        :param ids: Primary keys returned by parse_ids
+        :param fields: Names of the returned fields
+        :param tree: Tree of expanded relations, see core.expand
+        """
+        rows = list(queryset.filter(pk__in=ids).values(*fields))
+        if tree:
+            rows = expand_rows(model, rows, tree)
+        return self.get_many_response(model, ids, rows)
+
+    def parse_query(
+        self, model, ordering: bool = True
+    ) -> tuple[list[str], dict, Optional[str], QuerySet]:
+        """
+        Return 4-tuple of (fields, expanded relations, ordering,
+        filtered queryset) requested by the query string.
+
+        :param model: Model class
+        :param ordering: Whether to parse ``?ordering=``, else it's None
+        :raises InvalidQueryError: If the query string is not valid
+        """
+        params = self.request.GET
+        fields = parse_fields(
+            params,
+            [field.attname for field in model._meta.concrete_fields],
+            model._meta.pk.attname,
+        )
+        tree = parse_expand(model, params)
+        ordering = get_ordering(model, params) if ordering else None
+        queryset = filter_queryset(model.objects.all(), params)
+        return fields, tree, ordering, queryset
+
+    @staticmethod
+    def get_many_response(model, ids: list, rows: list[dict]) -> JsonResponse:
+        """
+        Return loaded objects keyed by ID and the list of missing IDs.
+
+        :param model: Model class
+        :param ids: Requested primary keys
+        :param rows: Loaded rows
+        """
+        pk_name = model._meta.pk.attname
+        objects = {row[pk_name]: row for row in rows}
+        return JsonResponse(
+            {
+                "results": {pk: objects[pk] for pk in ids if pk in objects},
+                "missing": [pk for pk in ids if pk not in objects],
+            }
+        )
+
+    @staticmethod
+    def get_extra_key(
+        model, fields: list[str], ordering: Optional[str]
+    ) -> Optional[str]:
+        """
+        Return attname of the ordering field if it's not returned,
+        because the cursor needs its value.
+
+        :param model: Model class
+        :param fields: Names of the returned fields
+        :param ordering: Field name, prefixed with "-" for descending order
+        """
+        if ordering:
+            order_key = model._meta.get_field(ordering.lstrip("-")).attname
+            if order_key not in fields:
+                return order_key
+        return None
+
+    def list(
+        self,
+        model,
+        queryset: QuerySet,
+        fields: list[str],
+        tree: dict,
+        ordering: Optional[str],
+    ) -> JsonResponse:
+        """
+        Return all objects (``?all=1``) or one page of objects.
+
+        :param model: Model class
+        :param queryset: Filtered queryset of the model
+        :param fields: Names of the returned fields
+        :param tree: Tree of expanded relations, see core.expand
+        :param ordering: Field name, prefixed with "-" for descending order
+        :raises InvalidQueryError: If pagination parameters are not valid
+        """
+        if self.request.GET.get("all") == "1":
+            rows = list(order_queryset(queryset.values(*fields), ordering))
+            if tree:
+                rows = expand_rows(model, rows, tree)
+            return JsonResponse(rows, safe=False)
+
+        extra_key = self.get_extra_key(model, fields, ordering)
+        queryset = queryset.values(
+            *fields, *([extra_key] if extra_key else [])
+        )
+        page = paginate(queryset, self.request.GET, ordering)
+
+        if extra_key:
+            for row in page["results"]:
+                del row[extra_key]
+        if tree:
+            page["results"] = expand_rows(model, page["results"], tree)
+        return JsonResponse(page)
 
 
 class ObjectDetailView(View):
@@ -109,6 +451,8 @@ class ObjectDetailView(View):
     def get(self, *args, **kwargs):
         """
         Return detail of a given object.
+        ``?fields=id,name`` selects the returned fields.
+        ``?expand=attributes.name,images`` nests related objects.
         """
         model_name = self.kwargs["model_name"]
         pk = self.kwargs["pk"]
@@ -124,15 +468,459 @@ class ObjectDetailView(View):
             )
 
         try:
-            obj = model.objects.get(pk=pk)
+            fields, tree = self.parse_query(model)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        # Changes of other objects of the model don't change the ETag.
+        # If the object doesn't exist, its deletion or creation does.
+        # Through models don't store the time of their change, so any
+        # change of the model does.
+        models = get_dependencies(model, fields, tree)
+        updated_on = None
+        if issubclass(model, TrackedModel):
+            updated_on = (
+                model.objects.filter(pk=pk)
+                .values_list("updated_on", flat=True)
+                .first()
+            )
+        if updated_on:
+            models.discard(model)
+        return cached_response(
+            self.request,
+            models,
+            lambda: self.detail(model, pk, fields, tree),
+            updated_on,
+        )
+
+    def detail(
+        self, model, pk: int, fields: list[str], tree: dict
+    ) -> JsonResponse:
+        """
+        Return detail of the object, or 404 if it doesn't exist.
+
+        :param model: Model class
+        :param pk: Primary key of the object
+        :param fields: Names of the returned fields
+        :param tree: Tree of expanded relations, see core.expand
+        """
+        fields, queryset = self.get_detail_queryset(model, fields, tree)
+        try:
+            obj = queryset.get(pk=pk)
         except model.DoesNotExist:
+            return self.not_found(model, pk)
+
+        data = get_serializer(model).serialize(obj, fields)
+        data.update(expand_object(obj, tree))
+        return JsonResponse(data)
+
+    def parse_query(self, model) -> tuple[list[str], dict]:
+        """
+        Return 2-tuple of (fields, expanded relations) requested
+        by the query string.
+
+        :param model: Model class
+        :raises InvalidQueryError: If the query string is not valid
+        """
+        opts = model._meta
+        fields = parse_fields(
+            self.request.GET,
+            [field.name for field in opts.concrete_fields]
+            + [field.name for field in opts.many_to_many],
+            opts.pk.name,
+        )
+        tree = parse_expand(model, self.request.GET)
+        return fields, tree
+
+    @staticmethod
+    def get_detail_queryset(
+        model, fields: list[str], tree: dict
+    ) -> tuple[list[str], QuerySet]:
+        """
+        Return 2-tuple of (serialized fields, queryset loading
+        the object with its expanded relations).
+
+        :param model: Model class
+        :param fields: Names of the returned fields
+        :param tree: Tree of expanded relations, see core.expand
+        """
+        # Expanded relations replace their IDs and are always included.
+        # Other many-to-many fields are serialized as lists of IDs.
+        fields = [name for name in fields if name not in tree]
+        concrete = {field.name for field in model._meta.concrete_fields}
+        queryset = model.objects.only(
+            *[name for name in [*fields, *tree] if name in concrete]
+        )
+        return fields, with_related(queryset, tree)
+
+    @staticmethod
+    def not_found(model, pk: int) -> JsonResponse:
+        """
+        Return 404 response of a missing object.
+
+        :param model: Model class
+        :param pk: Primary key of the object
+        """
+        return JsonResponse(
+            {
+                "status": "error",
+                "error": f"{model._meta.verbose_name.capitalize()} "
+                f"with ID {pk} does not exist",
+            },
+            status=404,
+        )
+
+
+class AsyncModelListView(ModelListView):
+    """
+    Async version of ModelListView for ASGI servers, see core.asgi.
+    Queries run in the thread of the async ORM, so waiting for the
+    database or for a slow client doesn't hold a worker.
+    """
+
+    async def get(self, *args, **kwargs):
+        """
+        List objects for a given model, same as ModelListView.get.
+        """
+        model_name = self.kwargs["model_name"]
+        model = get_model(model_name)
+        if not model:
             return JsonResponse(
                 {
                     "status": "error",
-                    "error": f"{model._meta.verbose_name.capitalize()} "
-                    f"with ID {pk} does not exist",
+                    "error": f"Invalid model name: {model_name}",
+                },
+                status=400,
+            )
+
+        params = self.request.GET
+        try:
+            fields, tree, ordering, queryset = self.parse_query(model)
+
+            if "ids" in params:
+                ids = parse_ids(model, params["ids"].split(","))
+                return await acached_response(
+                    self.request,
+                    get_dependencies(model, [], tree),
+                    lambda: self.aget_many(
+                        model, queryset, ids, fields, tree
+                    ),
+                )
+
+            if params.get("stream") == "1":
+                chunk_size = settings.LIST_STREAM_CHUNK_SIZE
+                rows = order_queryset(
+                    queryset.values(*fields), ordering
+                ).aiterator(chunk_size=chunk_size)
+                if tree:
+                    rows = aiter_expanded_rows(model, rows, tree, chunk_size)
+                return astream_rows(self.request, rows)
+
+            return await acached_response(
+                self.request,
+                get_dependencies(model, [], tree),
+                lambda: self.alist(model, queryset, fields, tree, ordering),
+            )
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+    async def post(self, *args, **kwargs):
+        """
+        Return objects with IDs listed in the JSON body,
+        same as ModelListView.post.
+        """
+        model_name = self.kwargs["model_name"]
+        model = get_model(model_name)
+        if not model:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Invalid model name: {model_name}",
+                },
+                status=400,
+            )
+
+        try:
+            ids, fields, tree, queryset = self.parse_body(model)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        return await self.aget_many(model, queryset, ids, fields, tree)
+
+    async def aget_many(
+        self,
+        model,
+        queryset: QuerySet,
+        ids: list,
+        fields: list[str],
+        tree: dict,
+    ) -> JsonResponse:
+        """
+        Async version of get_many.
+        """
+        rows = [
+            row async for row in queryset.filter(pk__in=ids).values(*fields)
+        ]
+        if tree:
+            rows = await sync_to_async(expand_rows)(model, rows, tree)
+        return self.get_many_response(model, ids, rows)
+
+    async def alist(
+        self,
+        model,
+        queryset: QuerySet,
+        fields: list[str],
+        tree: dict,
+        ordering: Optional[str],
+    ) -> JsonResponse:
+        """
+        Async version of list.
+        """
+        if self.request.GET.get("all") == "1":
+            rows = [
+                row
+                async for row in order_queryset(
+                    queryset.values(*fields), ordering
+                )
+            ]
+            if tree:
+                rows = await sync_to_async(expand_rows)(model, rows, tree)
+            return JsonResponse(rows, safe=False)
+
+        extra_key = self.get_extra_key(model, fields, ordering)
+        queryset = queryset.values(
+            *fields, *([extra_key] if extra_key else [])
+        )
+        page = await apaginate(queryset, self.request.GET, ordering)
+
+        if extra_key:
+            for row in page["results"]:
+                del row[extra_key]
+        if tree:
+            page["results"] = await sync_to_async(expand_rows)(
+                model, page["results"], tree
+            )
+        return JsonResponse(page)
+
+
+class AsyncObjectDetailView(ObjectDetailView):
+    """
+    Async version of ObjectDetailView for ASGI servers, see core.asgi.
+    """
+
+    async def get(self, *args, **kwargs):
+        """
+        Return detail of a given object, same as ObjectDetailView.get.
+        """
+        model_name = self.kwargs["model_name"]
+        pk = self.kwargs["pk"]
+
+        model = get_model(model_name)
+        if not model:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Invalid model name: {model_name}",
+                },
+                status=400,
+            )
+
+        try:
+            fields, tree = self.parse_query(model)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        models = get_dependencies(model, fields, tree)
+        updated_on = None
+        if issubclass(model, TrackedModel):
+            updated_on = (
+                await model.objects.filter(pk=pk)
+                .values_list("updated_on", flat=True)
+                .afirst()
+            )
+        if updated_on:
+            models.discard(model)
+        return await acached_response(
+            self.request,
+            models,
+            lambda: self.adetail(model, pk, fields, tree),
+            updated_on,
+        )
+
+    async def adetail(
+        self, model, pk: int, fields: list[str], tree: dict
+    ) -> JsonResponse:
+        """
+        Async version of detail.
+        """
+        fields, queryset = self.get_detail_queryset(model, fields, tree)
+        try:
+            obj = await queryset.aget(pk=pk)
+        except model.DoesNotExist:
+            return self.not_found(model, pk)
+
+        # Expanded relations are prefetched by aget, so they don't query
+        data = await get_serializer(model).aserialize(obj, fields)
+        data.update(expand_object(obj, tree))
+        return JsonResponse(data)
+
+
+class CatalogDocumentView(View):
+    """
+    View providing precomputed document of a catalog.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Return catalog with its image, attributes and products,
+        each product with its attributes and images.
+        """
+        pk = self.kwargs["pk"]
+        content = get_document(pk)
+        if content is None:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Catalog with ID {pk} does not exist",
+                },
+                status=404,
+            )
+        return HttpResponse(content, content_type="application/json")
+
+
+class CatalogFacetsView(View):
+    """
+    View providing attribute facets of a catalog.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Return attribute names and values of the catalog's products
+        with product counts. ``?selected=1:4,2:7`` selects values
+        (attribute name ID:value ID), values of one name are alternatives.
+        """
+        pk = self.kwargs["pk"]
+        try:
+            selected = parse_selected(self.request.GET)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        index = get_facet_index(pk)
+        if index is None:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Catalog with ID {pk} does not exist",
                 },
                 status=404,
             )
+        return JsonResponse(index.get_facets(selected))
+
+
+class SearchView(View):
+    """
+    View providing full-text search of products.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Return products matching all words of ``?q=``, best matches first.
+        ``?catalog=1`` and ``?is_published=true`` narrow the search,
+        ``?limit=`` sets the number of results.
+        """
+        params = self.request.GET
+        try:
+            query = params.get("q", "").strip()
+            if not query:
+                raise InvalidQueryError("Missing search query")
+            limit = get_limit(params)
+            queryset = Product.objects.all()
+            if "is_published" in params:
+                queryset = filter_queryset(
+                    queryset, {"is_published": params["is_published"]}
+                )
+            if "catalog" in params:
+                catalog = params["catalog"]
+                if not catalog.isdecimal():
+                    raise InvalidQueryError(f"Invalid catalog: {catalog}")
+                queryset = filter_catalog(queryset, int(catalog))
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+
+        fields = [field.attname for field in Product._meta.concrete_fields]
+        results = search_products(query, queryset).values(*fields, "rank")
+        return JsonResponse({"results": list(results[:limit])})
+
 
-        return JsonResponse(model_to_dict(obj))
+class ChangesView(View):
+    """
+    View providing objects of a given model changed since a given time.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Return objects created or updated since ``?since=`` (ISO date
+        and time), oldest changes first. Pass the returned ``next``
+        cursor as ``?after=`` to get the following page, and once
+        there are no more pages, store ``cursor`` and pass it
+        as ``?after=`` later to get only newer changes.
+        ``?limit=`` and ``?fields=`` work as with the list endpoint.
+        """
+        model_name = self.kwargs["model_name"]
+        model = get_model(model_name)
+        if not model:
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Invalid model name: {model_name}",
+                },
+                status=400,
+            )
+        if not issubclass(model, TrackedModel):
+            return JsonResponse(
+                {
+                    "status": "error",
+                    "error": f"Changes of {model_name} are not tracked",
+                },
+                status=400,
+            )
+
+        try:
+            fields = parse_fields(
+                self.request.GET,
+                [field.attname for field in model._meta.concrete_fields],
+                model._meta.pk.attname,
+            )
+            changes = get_changes(model, self.request.GET, fields)
+        except InvalidQueryError as e:
+            return JsonResponse(
+                {"status": "error", "error": str(e)}, status=400
+            )
+        return JsonResponse(changes)
+
+
+class MetricsView(View):
+    """
+    View exporting metrics of the process, see core.metrics.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Return request and import metrics in the Prometheus text format.
+        """
+        return HttpResponse(
+            metrics.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that latency and queries of all other middleware count
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,6 +80,63 @@ DATABASES = {
 db_from_env = dj_database_url.config()
 DATABASES["default"].update(db_from_env)
 
+# Number of rows written by one INSERT ... ON CONFLICT query during import
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+# Maximum number of invalid rows listed in an import report
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 1000))
+
+# Number of threads per web process running background imports
+IMPORT_JOB_WORKERS = int(os.environ.get("IMPORT_JOB_WORKERS", 2))
+
+# Default and maximum number of objects on one page of list endpoints
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 100))
+LIST_MAX_PAGE_SIZE = int(os.environ.get("LIST_MAX_PAGE_SIZE", 1000))
+
+# Number of rows fetched and encoded at once by streaming list responses
+LIST_STREAM_CHUNK_SIZE = int(os.environ.get("LIST_STREAM_CHUNK_SIZE", 2000))
+
+# Maximum number of IDs requested at once from a list endpoint
+MULTI_GET_MAX_IDS = int(os.environ.get("MULTI_GET_MAX_IDS", 1000))
+
+# Maximum number of catalogs whose facet indexes are kept in memory
+# by every web process, see core.facets
+FACET_INDEX_MAX_CATALOGS = int(
+    os.environ.get("FACET_INDEX_MAX_CATALOGS", 100)
+)
+
+# Rows changed within this many seconds are left out of the change feed
+# until transactions which wrote rows before them commit, see core.changes
+CHANGES_SAFETY_WINDOW = int(os.environ.get("CHANGES_SAFETY_WINDOW", 10))
+
+# Requests taking at least this many milliseconds are logged
+# with their slowest queries, see core.metrics
+METRICS_SLOW_REQUEST_MS = int(os.environ.get("METRICS_SLOW_REQUEST_MS", 1000))
+
+# Serve list and detail endpoints by async views, for ASGI servers
+# running whysapi.asgi, see core.asgi
+ASYNC_READ_VIEWS = bool(int(os.environ.get("ASYNC_READ_VIEWS", 0)))
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# Local memory cache evicts least recently used entries above MAX_ENTRIES
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "whysapi",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    }
+}
+
+# Cache used for list and detail responses and the maximum size
+# of a cached response in bytes
+RESPONSE_CACHE = "default"
+RESPONSE_CACHE_MAX_SIZE = int(
+    os.environ.get("RESPONSE_CACHE_MAX_SIZE", 1024 * 1024)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators